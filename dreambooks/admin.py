@@ -1,4 +1,5 @@
-from .models import Genre, Story, Chapter, ContactMessage
+from .forms import ChapterForm
+from .models import Genre, Story, Chapter, ContactMessage, Job
 from django.contrib import admin
 
 admin.site.register(Genre)
@@ -9,14 +10,26 @@ class StoryAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description')
     prepopulated_fields = {'slug': ('title',)}  # optional: auto-generate slug
 
+class ChapterAdminForm(ChapterForm):
+    class Meta(ChapterForm.Meta):
+        fields = ['story', 'title', 'order', 'content']
+
 @admin.register(Chapter)
 class ChapterAdmin(admin.ModelAdmin):
+    form = ChapterAdminForm
     list_display = ('title', 'story', 'order', 'created_at')
     list_filter = ('story',)
-    search_fields = ('title', 'content')
+    search_fields = ('title',)
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ('user', 'message', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('user__username', 'message')
\ No newline at end of file
+    search_fields = ('user__username', 'message')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error',)
@@ -0,0 +1,167 @@
+"""
+View counting and trending.
+
+story_detail and chapter_detail only bump an in-memory counter; flush_views()
+writes a batch of them as one upsert into hourly StoryViewBucket rows plus one
+UPDATE of Story.view_count, so page views never queue up behind each other on
+the database's write lock. refresh_trending() (a job, scheduled at most once per
+TRENDING_REFRESH_INTERVAL across all processes after views come in) rolls old hourly buckets into
+daily ones and recomputes Story.trending_score, an exponentially decayed view
+count that home reads with one index scan.
+"""
+import operator
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from .buffers import WriteBuffer
+from .jobs import enqueue
+from .models import Chapter, Story, StoryViewBucket, TrendingState
+
+STORY_VIEW = 'story'
+CHAPTER_VIEW = 'chapter'
+
+# a view HALF_LIFE old counts half as much as one made now
+HALF_LIFE = timedelta(hours=24)
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_REFRESH_INTERVAL = 60 * 10  # seconds
+# hourly buckets are kept this long, daily ones DAILY_RETENTION
+HOURLY_RETENTION = timedelta(days=2)
+DAILY_RETENTION = timedelta(days=90)
+
+PERIODS = {
+    StoryViewBucket.HOUR: timedelta(hours=1),
+    StoryViewBucket.DAY: timedelta(days=1),
+}
+
+
+def _hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_buckets(rows):
+    """Add ``(story_id, period, start, story_views, chapter_views)`` rows onto their buckets."""
+    if not rows:
+        return
+    table = connection.ops.quote_name(StoryViewBucket._meta.db_table)
+    start = StoryViewBucket._meta.get_field('start')
+    # one statement that inserts new buckets and adds onto existing ones, so two
+    # processes flushing the same hour never lose each other's counts
+    sql = (
+        f'INSERT INTO {table} (story_id, period, start, story_views, chapter_views) '
+        f'VALUES (%s, %s, %s, %s, %s) '
+        f'ON CONFLICT (story_id, period, start) DO UPDATE SET '
+        f'story_views = {table}.story_views + excluded.story_views, '
+        f'chapter_views = {table}.chapter_views + excluded.chapter_views'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (story_id, period, start.get_db_prep_value(moment, connection), story_views, chapter_views)
+            for story_id, period, moment, story_views, chapter_views in rows
+        ])
+
+
+def flush_views(items):
+    """Write ``{(kind, slug_or_chapter_id, hour): views}`` into hourly buckets and Story.view_count."""
+    slugs = {key for kind, key, _ in items if kind == STORY_VIEW}
+    chapter_ids = {key for kind, key, _ in items if kind == CHAPTER_VIEW}
+    story_ids = dict(Story.objects.filter(slug__in=slugs).values_list('slug', 'pk')) if slugs else {}
+    chapter_stories = dict(Chapter.objects.filter(pk__in=chapter_ids).values_list('pk', 'story_id')) \
+        if chapter_ids else {}
+
+    buckets = defaultdict(lambda: [0, 0])
+    totals = defaultdict(int)
+    for (kind, key, hour), views in items.items():
+        story_id = story_ids.get(key) if kind == STORY_VIEW else chapter_stories.get(key)
+        if story_id is None:  # deleted since
+            continue
+        buckets[story_id, hour][0 if kind == STORY_VIEW else 1] += views
+        totals[story_id] += views
+    if not totals:
+        return
+
+    with transaction.atomic():
+        _add_buckets([(story_id, StoryViewBucket.HOUR, hour, story_views, chapter_views)
+                      for (story_id, hour), (story_views, chapter_views) in buckets.items()])
+        # plain update(): a view must not move modified_at and with it the page caches
+        Story.objects.filter(pk__in=totals).update(view_count=F('view_count') + Case(
+            *[When(pk=story_id, then=Value(views)) for story_id, views in totals.items()],
+            default=Value(0),
+        ))
+    now = timezone.now()
+    if TrendingState.claim_schedule(now, now + timedelta(seconds=TRENDING_REFRESH_INTERVAL)):
+        from . import tasks  # tasks imports this module
+        enqueue(tasks.refresh_trending, delay=TRENDING_REFRESH_INTERVAL)
+
+
+view_buffer = WriteBuffer(flush_views, merge=operator.add)
+
+
+def record_view(kind, key):
+    view_buffer.add((kind, key, _hour(timezone.now())), 1)
+
+
+def counts_views(kind, key_kwarg):
+    """
+    Count each GET of the view, including ones answered from the page cache or
+    with 304 Not Modified, so it goes outside those decorators. ``key_kwarg``
+    names the URL kwarg identifying the page: the story slug or chapter pk.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            response = await view_func(request, *args, **kwargs)
+            if request.method == 'GET' and response.status_code in (200, 304):
+                record_view(kind, kwargs[key_kwarg])
+                if view_buffer.due():
+                    await sync_to_async(view_buffer.flush)()
+            return response
+        return wrapper
+    return decorator
+
+
+def rollup_views(now=None):
+    """Fold hourly buckets older than HOURLY_RETENTION into daily ones and drop expired buckets."""
+    now = now or timezone.now()
+    # days are UTC days whatever TIME_ZONE says, so the cutoff and the truncation agree
+    cutoff = (now - HOURLY_RETENTION).astimezone(dt_timezone.utc)
+    cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)  # whole days only
+    hourly = StoryViewBucket.objects.filter(period=StoryViewBucket.HOUR, start__lt=cutoff)
+    with transaction.atomic():
+        days = (hourly.annotate(day=TruncDay('start', tzinfo=dt_timezone.utc)).values('story_id', 'day')
+                .annotate(story_total=Sum('story_views'), chapter_total=Sum('chapter_views')).order_by())
+        _add_buckets([(row['story_id'], StoryViewBucket.DAY, row['day'], row['story_total'], row['chapter_total'])
+                      for row in days])
+        hourly.delete()
+        StoryViewBucket.objects.filter(period=StoryViewBucket.DAY, start__lt=now - DAILY_RETENTION).delete()
+
+
+def trending_scores(now=None):
+    """{story_id: score} over TRENDING_WINDOW, each view weighted by its age."""
+    now = now or timezone.now()
+    scores = defaultdict(float)
+    buckets = StoryViewBucket.objects.filter(start__gte=now - TRENDING_WINDOW).values_list(
+        'story_id', 'period', 'start', 'story_views', 'chapter_views')
+    for story_id, period, start, story_views, chapter_views in buckets.iterator():
+        age = max(now - (start + PERIODS[period] / 2), timedelta(0))
+        scores[story_id] += (story_views + chapter_views) * 0.5 ** (age / HALF_LIFE)
+    return scores
+
+
+def refresh_trending(now=None):
+    now = now or timezone.now()
+    rollup_views(now)
+    scores = trending_scores(now)
+    with transaction.atomic():
+        Story.objects.filter(trending_score__gt=0).update(trending_score=0)
+        Story.objects.bulk_update([Story(pk=pk, trending_score=score) for pk, score in scores.items()],
+                                  ['trending_score'], batch_size=500)
+        # part of home's validator, so the Trending section shows the new order
+        TrendingState.mark_refreshed(now)
+    return len(scores)
@@ -0,0 +1,289 @@
+"""
+Read-only JSON API, version 1 (``/api/v1/``).
+
+Every endpoint costs a fixed number of queries: ``?fields=`` picks the
+attributes returned, and only the columns, joins and prefetches those fields
+need are loaded. Lists page with opaque cursors (``?cursor=``, ``?limit=``);
+``/stories/?ids=`` fetches up to MAX_IDS stories in one call.
+"""
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from .conditional import (
+    CHAPTER_MAX_AGE, LISTING_MAX_AGE, STORY_MAX_AGE, catalogue_validator, conditional_page, story_validator,
+)
+from .models import Chapter, ChapterBody, Genre, Review, Story
+from .pagination import CursorPaginator
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_IDS = 100
+
+STORY_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'oldest': ('created_at', 'id'),
+    'updated': ('-updated_at', '-id'),
+    'rating': ('-rating_score', '-created_at', '-id'),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ApiField:
+    """How to read one attribute, and the columns, joins or prefetches that needs."""
+
+    def __init__(self, value, columns=(), related=(), prefetch=(), annotations=None):
+        self.value = value
+        self.columns = columns
+        self.related = related
+        self.prefetch = prefetch
+        self.annotations = annotations or {}
+
+
+def _attr(name):
+    return ApiField(lambda obj: getattr(obj, name), columns=(name,))
+
+
+STORY_FIELDS = {
+    'id': _attr('id'),
+    'slug': _attr('slug'),
+    'title': _attr('title'),
+    'description': _attr('description'),
+    'author': ApiField(lambda story: story.author.username, columns=('author__username',), related=('author',)),
+    'genres': ApiField(lambda story: [genre.slug for genre in story.genres.all()],
+                       prefetch=(Prefetch('genres', queryset=Genre.objects.only('id', 'slug')),)),
+    'cover': ApiField(lambda story: story.cover_image.url if story.cover_image else None,
+                      columns=('cover_image',)),
+    'rating': _attr('avg_rating'),
+    'rating_count': _attr('rating_count'),
+    'rating_score': _attr('rating_score'),
+    'created_at': _attr('created_at'),
+    'updated_at': _attr('updated_at'),
+    'url': ApiField(lambda story: reverse('story_detail', args=[story.slug]), columns=('slug',)),
+}
+
+CHAPTER_FIELDS = {
+    'id': _attr('id'),
+    'title': _attr('title'),
+    'order': _attr('order'),
+    'created_at': _attr('created_at'),
+    'body_url': ApiField(lambda chapter: reverse('api_chapter_body', args=[chapter.story.slug, chapter.pk]),
+                         columns=('story__slug',), related=('story',)),
+}
+
+REVIEW_FIELDS = {
+    'id': _attr('id'),
+    'author': ApiField(lambda review: review.author.username, columns=('author__username',), related=('author',)),
+    'rating': _attr('rating'),
+    'comment': _attr('comment'),
+    'created_at': _attr('created_at'),
+    'updated_at': _attr('updated_at'),
+}
+
+GENRE_FIELDS = {
+    'id': _attr('id'),
+    'name': _attr('name'),
+    'slug': _attr('slug'),
+}
+
+def _count_for_user(model):
+    # a correlated subquery per count; two joined Counts would multiply stories by reviews
+    rows = model.objects.filter(author=OuterRef('pk')).order_by().values('author')
+    return Coalesce(Subquery(rows.annotate(c=Count('pk')).values('c'), output_field=IntegerField()), Value(0))
+
+
+USER_FIELDS = {
+    'id': _attr('id'),
+    'username': _attr('username'),
+    'date_joined': _attr('date_joined'),
+    'story_count': ApiField(lambda user: user.story_count,
+                            annotations={'story_count': _count_for_user(Story)}),
+    'review_count': ApiField(lambda user: user.review_count,
+                             annotations={'review_count': _count_for_user(Review)}),
+    'url': ApiField(lambda user: reverse('profile', args=[user.username]), columns=('username',)),
+}
+
+
+def api_view(view_func):
+    """Turn ApiError into a JSON error response; GET and HEAD only."""
+    @require_safe
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view_func(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({'error': exc.message}, status=exc.status)
+    return wrapper
+
+
+def _field_names(request, fields):
+    """The fields requested with ``?fields=a,b`` (all by default); ``id`` is always included."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(fields)
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(fields)}.")
+    return ['id', *(name for name in names if name != 'id')]
+
+
+def _shape(queryset, fields, names, ordering=()):
+    """Restrict ``queryset`` to what ``names`` (and the cursor ``ordering``) read."""
+    columns = {'id', *(name.lstrip('-') for name in ordering)}
+    related, prefetch, annotations = set(), [], {}
+    for name in names:
+        field = fields[name]
+        columns.update(field.columns)
+        related.update(field.related)
+        prefetch.extend(field.prefetch)
+        annotations.update(field.annotations)
+    if annotations:
+        queryset = queryset.annotate(**annotations)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.prefetch_related(*prefetch).only(*columns)
+
+
+def _serialize(obj, fields, names):
+    return {name: fields[name].value(obj) for name in names}
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit') or DEFAULT_LIMIT)
+    except ValueError:
+        raise ApiError(400, "limit must be an integer.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _ids(request):
+    try:
+        ids = list(dict.fromkeys(int(value) for value in request.GET['ids'].split(',') if value.strip()))
+    except ValueError:
+        raise ApiError(400, "ids must be a comma-separated list of integers.")
+    if not ids or len(ids) > MAX_IDS:
+        raise ApiError(400, f"Pass between 1 and {MAX_IDS} ids.")
+    return ids
+
+
+async def _page(request, queryset, fields, ordering):
+    """One cursor page as ``{'data': [...], 'next': url}``."""
+    names = _field_names(request, fields)
+    paginator = CursorPaginator(_shape(queryset, fields, names, ordering), ordering, _limit(request))
+    query = request.GET.copy()
+    page = await paginator.apage(query.get('cursor'), query=query, param='cursor')
+    return {
+        'data': [_serialize(obj, fields, names) for obj in page.object_list],
+        'next': f'{request.path}{page.next_query}' if page.has_next else None,
+    }
+
+
+async def _batch(request, queryset, fields):
+    """The objects named by ``?ids=``, in the order given; unknown ids are listed under ``missing``."""
+    ids = _ids(request)
+    names = _field_names(request, fields)
+    found = {obj.pk: obj async for obj in _shape(queryset, fields, names).filter(pk__in=ids)}
+    return {
+        'data': [_serialize(found[pk], fields, names) for pk in ids if pk in found],
+        'missing': [pk for pk in ids if pk not in found],
+    }
+
+
+async def _story_or_404(slug):
+    # only asked when a story's list came back empty, to tell "none yet" from "no such story"
+    if not await Story.objects.filter(slug=slug).aexists():
+        raise ApiError(404, "Story not found.")
+
+
+@conditional_page(catalogue_validator, LISTING_MAX_AGE)
+@api_view
+async def story_list(request):
+    stories = Story.objects.all()
+    if 'ids' in request.GET:
+        return JsonResponse(await _batch(request, stories, STORY_FIELDS))
+
+    order = request.GET.get('order') or 'newest'
+    if order not in STORY_ORDERINGS:
+        raise ApiError(400, f"order must be one of {', '.join(STORY_ORDERINGS)}.")
+    if request.GET.get('genre'):
+        stories = stories.filter(genres__slug=request.GET['genre'])
+    if request.GET.get('author'):
+        stories = stories.filter(author__username=request.GET['author'])
+    return JsonResponse(await _page(request, stories, STORY_FIELDS, STORY_ORDERINGS[order]))
+
+
+@conditional_page(story_validator, STORY_MAX_AGE)
+@api_view
+async def story_detail(request, slug):
+    names = _field_names(request, STORY_FIELDS)
+    story = await _shape(Story.objects.filter(slug=slug), STORY_FIELDS, names).afirst()
+    if story is None:
+        raise ApiError(404, "Story not found.")
+    return JsonResponse({'data': _serialize(story, STORY_FIELDS, names)})
+
+
+@conditional_page(story_validator, STORY_MAX_AGE)
+@api_view
+async def chapter_list(request, slug):
+    chapters = Chapter.objects.filter(story__slug=slug)
+    if 'ids' in request.GET:
+        return JsonResponse(await _batch(request, chapters, CHAPTER_FIELDS))
+    result = await _page(request, chapters, CHAPTER_FIELDS, ('order', 'id'))
+    if not result['data'] and 'cursor' not in request.GET:
+        await _story_or_404(slug)
+    return JsonResponse(result)
+
+
+@conditional_page(story_validator, CHAPTER_MAX_AGE)
+@api_view
+async def chapter_body(request, slug, pk):
+    """The chapter text as stored (``?format=text``) or rendered (``?format=html``, the default)."""
+    fmt = request.GET.get('format') or 'html'
+    if fmt not in ('html', 'text'):
+        raise ApiError(400, "format must be html or text.")
+    bodies = ChapterBody.objects.filter(chapter_id=pk, chapter__story__slug=slug)
+    if fmt == 'text':
+        bodies = bodies.defer('html_data')
+    body = await bodies.afirst()
+    if body is None:
+        raise ApiError(404, "Chapter not found.")
+    content = str(body.html) if fmt == 'html' else body.text
+    return JsonResponse({'data': {'id': pk, 'format': fmt, 'content': content}})
+
+
+@conditional_page(story_validator, STORY_MAX_AGE)
+@api_view
+async def review_list(request, slug):
+    reviews = Review.objects.filter(story__slug=slug)
+    result = await _page(request, reviews, REVIEW_FIELDS, ('-created_at', '-id'))
+    if not result['data'] and 'cursor' not in request.GET:
+        await _story_or_404(slug)
+    return JsonResponse(result)
+
+
+@api_view
+async def genre_list(request):
+    names = _field_names(request, GENRE_FIELDS)
+    genres = _shape(Genre.objects.order_by('name'), GENRE_FIELDS, names)
+    return JsonResponse({'data': [_serialize(genre, GENRE_FIELDS, names) async for genre in genres]})
+
+
+@api_view
+async def profile(request, username):
+    names = _field_names(request, USER_FIELDS)
+    user = await _shape(User.objects.filter(username=username, is_active=True), USER_FIELDS, names).afirst()
+    if user is None:
+        raise ApiError(404, "User not found.")
+    return JsonResponse({'data': _serialize(user, USER_FIELDS, names)})
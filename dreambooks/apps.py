@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DreambooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dreambooks'
+
+    def ready(self):
+        from . import signals, sqlite  # noqa: F401
+        from .jobs import check_shared_caches
+        check_shared_caches()
@@ -0,0 +1,340 @@
+import asyncio
+import io
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection, connections, reset_queries, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from .buffers import flush_all as flush_buffers
+from .models import Chapter, ContactMessage, Genre, Story
+
+# Maximum queries per anonymous GET. Lower these when a view gets cheaper;
+# raising one should be a deliberate, reviewed change.
+# The conditional-GET validator (dreambooks.conditional) accounts for one query
+# on home, story_list, story_detail and chapter_detail; home's Trending section for
+# two, plus one for when its scores were last refreshed.
+VIEW_BUDGETS = {
+    'home': 10,
+    'story_list': 4,
+    'story_detail': 6,
+    'chapter_detail': 3,
+    'profile': 3,
+}
+
+
+@contextmanager
+def benchmark_database(stories, chapters, seed, existing=False, path=None):
+    """
+    Seed a throwaway test database with the bulk seeder for the duration of the
+    block, or use the configured database as-is when ``existing`` is set.
+    ``path`` puts the test database in that file rather than the backend's
+    default (in memory for SQLite).
+    """
+    setup_test_environment()
+    old_name = None
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    try:
+        if not existing:
+            old_name = connection.settings_dict['NAME']
+            if path is not None:
+                test_settings['NAME'] = str(path)
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+            call_command('seed_stories', count=stories, chapters=chapters,
+                         bulk=True, seed=seed, stdout=io.StringIO())
+        yield
+    finally:
+        if old_name is not None:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+
+
+def benchmark_urls():
+    """Pick representative URLs for each budgeted view from the current database."""
+    story = Story.objects.select_related('author').order_by('-rating_count', 'id').first()
+    chapter = Chapter.objects.filter(story=story).order_by('order').first() if story else None
+    urls = {
+        'home': reverse('home'),
+        'story_list': reverse('story_list'),
+    }
+    if story:
+        urls['story_detail'] = reverse('story_detail', kwargs={'slug': story.slug})
+        urls['profile'] = reverse('profile', kwargs={'username': story.author.username})
+    if chapter:
+        urls['chapter_detail'] = reverse('chapter_detail', kwargs={'slug': story.slug, 'pk': chapter.pk})
+    return urls
+
+
+def _percentiles(timings):
+    cuts = statistics.quantiles(timings, n=20) if len(timings) > 1 else timings * 19
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(cuts[18], 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def _clear_caches():
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+
+
+def measure(client, url, iterations):
+    """Query count of a cold-cache first request plus render-time percentiles over ``iterations``."""
+    if iterations < 1:
+        raise ValueError("iterations must be at least 1")
+    _clear_caches()
+    flush_buffers()  # a due view/progress flush would otherwise land in the count
+    # request_started clears the query log, which would skew a non-empty capture
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    # read now: the timed requests below reset the query log the capture slices
+    queries = len(ctx.captured_queries)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'url': url,
+        'status': response.status_code,
+        'queries': queries,
+        **_percentiles(timings),
+    }
+
+
+def run_benchmarks(iterations=20, budgets=VIEW_BUDGETS):
+    """Measure every budgeted view; returns a JSON-serialisable report."""
+    client = Client()
+    views = {}
+    for name, url in sorted(benchmark_urls().items()):
+        result = measure(client, url, iterations)
+        result['budget'] = budgets.get(name)
+        result['over_budget'] = result['budget'] is not None and result['queries'] > result['budget']
+        views[name] = result
+    return {
+        'iterations': iterations,
+        'dataset': {
+            'stories': Story.objects.count(),
+            'chapters': Chapter.objects.count(),
+        },
+        'views': views,
+    }
+
+
+def _load_report(results, elapsed, concurrency):
+    timings = [ms for ms, _ in results]
+    return {
+        'requests': len(results),
+        'concurrency': concurrency,
+        'errors': sum(1 for _, status in results if status != 200),
+        'requests_per_second': round(len(results) / elapsed, 1),
+        **_percentiles(timings),
+    }
+
+
+def _load_wsgi(urls, concurrency, total):
+    local = threading.local()
+
+    def get(url):
+        # one client (and so one DB connection) per worker thread, as under a threaded WSGI server
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        start = time.perf_counter()
+        status = local.client.get(url).status_code
+        return (time.perf_counter() - start) * 1000, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(get, (urls[i % len(urls)] for i in range(total))))
+    return _load_report(results, time.perf_counter() - start, concurrency)
+
+
+async def _load_asgi(urls, concurrency, total):
+    client = AsyncClient()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def get(url):
+        async with slots:
+            start = time.perf_counter()
+            status = (await client.get(url)).status_code
+            return (time.perf_counter() - start) * 1000, status
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(get(urls[i % len(urls)]) for i in range(total)))
+    return _load_report(results, time.perf_counter() - start, concurrency)
+
+
+def run_load_test(concurrency=16, requests=400):
+    """
+    Push the same mix of read URLs through Django's WSGI handler (a thread per
+    in-flight request) and its ASGI handler (one event loop) in-process, and
+    report throughput and latency for each. No network or server is involved,
+    so the numbers compare request handling, not socket I/O.
+    """
+    urls = [url for _, url in sorted(benchmark_urls().items())]
+    # warm the caches so both handlers see the same state
+    warm = Client()
+    for url in urls:
+        warm.get(url)
+    return {
+        'urls': urls,
+        'wsgi': _load_wsgi(urls, concurrency, requests),
+        'asgi': asyncio.run(_load_asgi(urls, concurrency, requests)),
+    }
+
+
+def explain_urls():
+    """benchmark_urls() plus the story_list orderings and filters that use other indexes."""
+    urls = benchmark_urls()
+    story_list = urls['story_list']
+    urls['story_list_oldest'] = f'{story_list}?order=oldest'
+    urls['story_list_rating'] = f'{story_list}?order=rating'
+    genre = Genre.objects.order_by('name').values_list('name', flat=True).first()
+    if genre:
+        urls['story_list_genre'] = f'{story_list}?genre={genre}'
+    return urls
+
+
+def explain_query(sql):
+    """
+    SQLite's plan for ``sql`` as detail lines, plus the tables it reads in
+    full (``SCAN t`` without an index) and whether it needs a temporary sort.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = [row[-1] for row in cursor.fetchall()]
+    full_scans = [detail.split()[1] for detail in plan
+                  if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail]
+    return {
+        'plan': plan,
+        'full_scans': full_scans,
+        'temp_sort': any('TEMP B-TREE' in detail for detail in plan),
+    }
+
+
+def explain_views():
+    """
+    Run each read view once with every cache disabled, so all of its queries
+    reach the database, and explain each SELECT it issued.
+    """
+    if connection.vendor != 'sqlite':
+        raise ImproperlyConfigured(f"explain_views() reads SQLite query plans, not {connection.vendor}'s")
+    dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    client = Client()
+    views = {}
+    with override_settings(CACHES={alias: dummy for alias in settings.CACHES}):
+        for name, url in sorted(explain_urls().items()):
+            reset_queries()
+            with CaptureQueriesContext(connection) as ctx:
+                status = client.get(url).status_code
+            queries = []
+            for query in ctx.captured_queries:
+                if query['sql'].lstrip().upper().startswith(('SELECT', 'WITH')):
+                    queries.append({'sql': query['sql'], **explain_query(query['sql'])})
+            views[name] = {'url': url, 'status': status, 'queries': queries}
+    return {
+        'dataset': {
+            'stories': Story.objects.count(),
+            'chapters': Chapter.objects.count(),
+        },
+        'views': views,
+    }
+
+
+def _sqlite_read(rng, chapter_ids):
+    # what a chapter page reads on a cold cache
+    chapter = Chapter.objects.select_related('story__author', 'body').get(pk=rng.choice(chapter_ids))
+    Story.objects.filter(slug=chapter.story.slug).values_list('modified_at', flat=True).first()
+    return chapter.html
+
+
+def _sqlite_write(rng, stories):
+    story_id, author_id = rng.choice(stories)
+    with transaction.atomic():
+        Story.objects.filter(pk=story_id).touch()
+        ContactMessage.objects.create(user_id=author_id, message="Benchmark write.")
+
+
+def _run_sqlite_profile(pragmas, reconnect, readers, writers, duration, seed):
+    chapter_ids = list(Chapter.objects.values_list('pk', flat=True))
+    stories = list(Story.objects.values_list('pk', 'author_id'))
+    # every worker opens a fresh connection, which applies ``pragmas``
+    connections.close_all()
+
+    def work(kind, worker_seed):
+        rng = random.Random(worker_seed)
+        timings, errors = [], 0
+        try:
+            while time.monotonic() < stop:
+                start = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        _sqlite_read(rng, chapter_ids)
+                    else:
+                        _sqlite_write(rng, stories)
+                    timings.append((time.perf_counter() - start) * 1000)
+                except OperationalError:  # "database is locked"
+                    errors += 1
+                if reconnect:
+                    # what CONN_MAX_AGE = 0 does at the end of every request
+                    connection.close()
+        finally:
+            connection.close()
+        return kind, timings, errors
+
+    kinds = ['read'] * readers + ['write'] * writers
+    with override_settings(DREAMBOOKS_SQLITE_PRAGMAS=pragmas):
+        stop = time.monotonic() + duration
+        with ThreadPoolExecutor(max_workers=len(kinds)) as pool:
+            results = list(pool.map(work, kinds, range(seed, seed + len(kinds))))
+
+    report = {}
+    for kind in ('read', 'write'):
+        timings = [ms for k, ts, _ in results if k == kind for ms in ts]
+        report[kind] = {
+            'workers': kinds.count(kind),
+            'operations': len(timings),
+            'operations_per_second': round(len(timings) / duration, 1),
+            'errors': sum(errors for k, _, errors in results if k == kind),
+            **(_percentiles(timings) if timings else {}),
+        }
+    return report
+
+
+def run_sqlite_benchmark(readers=8, writers=2, duration=5.0, seed=0):
+    """
+    Run concurrent chapter reads and small write transactions against the
+    current SQLite database twice, for ``duration`` seconds each: once with
+    SQLite's defaults (rollback journal, a new connection per operation) and
+    once with DREAMBOOKS_SQLITE_PRAGMAS and the configured CONN_MAX_AGE.
+    """
+    if connection.vendor != 'sqlite':
+        raise ImproperlyConfigured(f"run_sqlite_benchmark() tunes SQLite, not {connection.vendor}")
+    tuned = getattr(settings, 'DREAMBOOKS_SQLITE_PRAGMAS', None)
+    if not tuned:
+        raise ImproperlyConfigured("DREAMBOOKS_SQLITE_PRAGMAS is empty; run with the production settings")
+    return {
+        'readers': readers,
+        'writers': writers,
+        'duration_s': duration,
+        'pragmas': tuned,
+        'default': _run_sqlite_profile({'journal_mode': 'delete'}, True, readers, writers, duration, seed),
+        'tuned': _run_sqlite_profile(tuned, not connection.settings_dict.get('CONN_MAX_AGE'),
+                                     readers, writers, duration, seed),
+    }
@@ -0,0 +1,93 @@
+import atexit
+import logging
+import threading
+import time
+import weakref
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_buffers = weakref.WeakSet()
+
+
+class WriteBuffer:
+    """
+    Coalesces frequent small writes in process memory and hands them to
+    ``flush(items)`` as one batch. Writes to the same key are merged with
+    ``merge(old, new)`` (by default the newer value wins), so a batch holds at
+    most one entry per key however often it was written.
+
+    Nothing here touches the database: callers check due() after add() and
+    run flush() themselves, from a worker thread in async code. Whatever is
+    still pending when the process exits is flushed then; a crash loses at
+    most ``max_age`` seconds or ``max_items`` keys of writes. Writes are never
+    flushed into a different database than the one they were buffered
+    against (e.g. after the test runner has dropped its test database).
+    """
+
+    def __init__(self, flush, merge=None, max_items=500, max_age=5.0):
+        self._flush = flush
+        self._merge = merge or (lambda old, new: new)
+        self.max_items = max_items
+        self.max_age = max_age
+        self._items = {}
+        self._oldest = None
+        self._database = None
+        self._lock = threading.Lock()
+        _buffers.add(self)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, key, value):
+        with self._lock:
+            if key in self._items:
+                value = self._merge(self._items[key], value)
+            self._items[key] = value
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._database = connection.settings_dict['NAME']
+
+    def pending(self):
+        """Keys written since the last flush."""
+        with self._lock:
+            return list(self._items)
+
+    def due(self):
+        oldest = self._oldest
+        return len(self._items) >= self.max_items or (
+            oldest is not None and time.monotonic() - oldest >= self.max_age
+        )
+
+    def clear(self):
+        """Drop every pending write."""
+        with self._lock:
+            self._items, self._oldest = {}, None
+
+    def flush(self):
+        with self._lock:
+            items, self._items, self._oldest = self._items, {}, None
+        if not items:
+            return 0
+        if self._database != connection.settings_dict['NAME']:
+            logger.info("Dropping %d buffered writes meant for database %s", len(items), self._database)
+            return 0
+        try:
+            self._flush(items)
+        except Exception:
+            logger.exception("Flushing %d buffered writes failed; keeping them for the next flush", len(items))
+            with self._lock:
+                for key, value in items.items():
+                    self._items[key] = self._merge(value, self._items[key]) if key in self._items else value
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+                    self._database = connection.settings_dict['NAME']
+            return 0
+        return len(items)
+
+
+@atexit.register
+def flush_all():
+    for buffer in list(_buffers):
+        buffer.flush()
@@ -0,0 +1,102 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+HITS_KEY = 'cards:hits'
+MISSES_KEY = 'cards:misses'
+
+
+def get_card_cache():
+    return caches[getattr(settings, 'DREAMBOOKS_CARD_CACHE', 'default')]
+
+
+def _version_key(story_id):
+    return f'cards:v:{story_id}'
+
+
+def _fragment_key(template_name, story_id, version):
+    return f'cards:{template_name}:{story_id}:{version}'
+
+
+def bump_card_versions(story_ids):
+    """Invalidate every cached card of these stories by giving them a new version stamp."""
+    story_ids = list(story_ids)
+    if not story_ids:
+        return
+    version = time.time_ns()
+    get_card_cache().set_many({_version_key(story_id): version for story_id in story_ids}, timeout=None)
+
+
+def _count(cache, key, amount):
+    if not amount:
+        return
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, amount, timeout=None)
+
+
+def card_cache_is_shared():
+    """False when every process keeps its own card cache (and its own counters)."""
+    return not isinstance(get_card_cache(), LocMemCache)
+
+
+def card_cache_stats():
+    cache = get_card_cache()
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    return counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+
+
+def reset_card_cache_stats():
+    get_card_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def render_cards(stories, template_name, request=None):
+    """
+    Render one card per story, reusing cached fragments where the story's
+    version stamp is unchanged. Two cache round trips per call regardless of
+    the number of cards. Querysets built with Story.objects.for_cards() come
+    with genres and author loaded; anything else is filled in for misses.
+    """
+    stories = list(stories)
+    cache = get_card_cache()
+    timeout = getattr(settings, 'DREAMBOOKS_CARD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+    # cards carrying per-request data (e.g. a search snippet) are never cached
+    cacheable = [story for story in stories if not getattr(story, 'search_snippet', '')]
+    versions = cache.get_many([_version_key(story.pk) for story in cacheable])
+    # a fresh stamp, never 0: fragments of an evicted stamp may still be cached
+    seed = time.time_ns()
+    missing_versions = {
+        _version_key(story.pk): seed for story in cacheable if _version_key(story.pk) not in versions
+    }
+    if missing_versions:
+        cache.set_many(missing_versions, timeout=None)
+        versions.update(missing_versions)
+
+    keys = {
+        story.pk: _fragment_key(template_name, story.pk, versions[_version_key(story.pk)])
+        for story in cacheable
+    }
+    fragments = cache.get_many(list(keys.values()))
+
+    misses = [story for story in stories if keys.get(story.pk) not in fragments]
+    prefetch_related_objects(misses, 'genres', 'author')
+    rendered = {}
+    for story in misses:
+        rendered[story.pk] = render_to_string(template_name, {'story': story}, request=request)
+    cache.set_many({keys[pk]: html for pk, html in rendered.items() if pk in keys}, timeout=timeout)
+
+    _count(cache, HITS_KEY, len(stories) - len(misses))
+    _count(cache, MISSES_KEY, len(misses))
+    return [
+        mark_safe(rendered[story.pk] if story.pk in rendered else fragments[keys[story.pk]])
+        for story in stories
+    ]
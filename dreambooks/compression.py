@@ -0,0 +1,66 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:  # standard library from Python 3.14
+    from compression import zstd as _zstd
+except ImportError:
+    _zstd = None
+try:
+    import zstandard as _zstandard
+except ImportError:
+    _zstandard = None
+
+# Bodies shorter than this are stored as-is; compressing them saves nothing.
+MIN_COMPRESS_BYTES = 256
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+def _zstd_compress(data):
+    if _zstd is not None:
+        return _zstd.compress(data, level=ZSTD_LEVEL)
+    return _zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+
+def _zstd_decompress(data):
+    if _zstd is not None:
+        return _zstd.decompress(data)
+    return _zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS = {
+    'none': (bytes, bytes),
+    'zlib': (lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress),
+}
+if _zstd is not None or _zstandard is not None:
+    CODECS['zstd'] = (_zstd_compress, _zstd_decompress)
+
+
+def default_codec():
+    codec = getattr(settings, 'DREAMBOOKS_CHAPTER_CODEC', 'zlib')
+    if codec not in CODECS:
+        raise ImproperlyConfigured(
+            f"DREAMBOOKS_CHAPTER_CODEC={codec!r} is not available; choose from {', '.join(sorted(CODECS))}"
+            + (" (install 'zstandard' for zstd)" if codec == 'zstd' else '')
+        )
+    return codec
+
+
+def compress_text(text, codec=None):
+    """Return ``(codec, data)`` for storing ``text``; short texts are left uncompressed."""
+    data = text.encode('utf-8')
+    codec = codec or default_codec()
+    if len(data) < MIN_COMPRESS_BYTES:
+        return 'none', data
+    compressed = CODECS[codec][0](data)
+    if len(compressed) >= len(data):
+        return 'none', data
+    return codec, compressed
+
+
+def decompress_text(codec, data):
+    if codec not in CODECS:
+        raise ImproperlyConfigured(f"Chapter body stored with unavailable codec {codec!r}")
+    return CODECS[codec][1](bytes(data)).decode('utf-8')
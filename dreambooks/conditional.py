@@ -0,0 +1,99 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import ReadingProgress, Story, TrendingState
+from .progress import flush_reader
+
+# Seconds a shared cache may serve an anonymous page without revalidating.
+LISTING_MAX_AGE = 60
+STORY_MAX_AGE = 120
+CHAPTER_MAX_AGE = 600
+
+
+async def story_validator(slug, **kwargs):
+    """One indexed lookup on Story.slug; chapter pages share their story's stamp."""
+    modified = await Story.objects.filter(slug=slug).values_list('modified_at', flat=True).afirst()
+    return None if modified is None else (modified, ())
+
+
+async def catalogue_validator(**kwargs):
+    # the count catches deletions, which leave the newest stamp unchanged
+    stamp = await Story.objects.aaggregate(last=Max('modified_at'), stories=Count('id'))
+    return None if stamp['last'] is None else (stamp['last'], (stamp['stories'],))
+
+
+async def home_validator(**kwargs):
+    # the catalogue, plus when the Trending order was last recomputed
+    stamp = await catalogue_validator()
+    return None if stamp is None else (stamp[0], (*stamp[1], await TrendingState.arefreshed_at()))
+
+
+async def progress_validator(user):
+    """When the reader's "Continue Reading" shelf last changed, counting progress still buffered."""
+    await sync_to_async(flush_reader)(user.pk)
+    stamp = await ReadingProgress.objects.filter(user=user).aaggregate(last=Max('updated_at'))
+    return (stamp['last'],)
+
+
+def _etag(request, modified, extra, user):
+    # per URL (cursors, filters), per user (nav, review form) and per deploy (templates)
+    parts = (getattr(settings, 'DREAMBOOKS_PAGE_VERSION', ''), request.get_full_path(),
+             user.pk or 0, modified.isoformat(), *extra)
+    return quote_etag(hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_page(validator, max_age, user_validator=None):
+    """
+    Answer GET/HEAD with 304 Not Modified when the client's ETag or
+    Last-Modified still matches, checking ``validator(**view_kwargs)`` before
+    the async view runs. ``validator`` returns ``(modified_at, extra)`` or None
+    to skip validation. ``user_validator(user)`` returns more ETag parts for
+    what a signed-in user sees of their own (it does not key the page cache).
+    Anonymous responses may be cached by shared caches for ``max_age``
+    seconds; signed-in ones are private and always revalidated.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view_func(request, *args, **kwargs)
+            # a pending flash message must be rendered, never answered with 304
+            if await sync_to_async(len)(get_messages(request)):
+                return await view_func(request, *args, **kwargs)
+            stamp = await validator(**kwargs)
+            if stamp is None:
+                return await view_func(request, *args, **kwargs)
+
+            modified, extra = stamp
+            request.page_stamp = stamp  # reused as the key of dreambooks.pagecache.cached_page
+            user = await request.auser()
+            if user_validator is not None and user.is_authenticated:
+                extra = (*extra, *await user_validator(user))
+            etag = _etag(request, modified, extra, user)
+            # Last-Modified can't tell users apart, so only anonymous pages get one
+            last_modified = None if user.is_authenticated else int(modified.timestamp())
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+
+            response.headers.setdefault('ETag', etag)
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+            if user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, public=True, max_age=max_age)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,197 @@
+"""
+Whole-story downloads (plain text and EPUB 3).
+
+A book is generated chapter by chapter from a server-side cursor and streamed
+to the reader while it is written to DREAMBOOKS_EXPORT_ROOT; later downloads
+are served from that file. Files are named after Story.modified_at, which every
+chapter change moves, so a stale export is simply never asked for again and is
+removed when the next one is finished.
+"""
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.html import linebreaks
+
+from .models import Chapter
+
+# Bump when the output of a format changes, so cached files are rebuilt.
+EXPORT_VERSION = 1
+# Chapters fetched per round trip; only this many bodies are in memory at once.
+CHAPTER_CHUNK_SIZE = 20
+
+FORMATS = {
+    'txt': 'text/plain; charset=utf-8',
+    'epub': 'application/epub+zip',
+}
+
+
+def export_root():
+    return Path(getattr(settings, 'DREAMBOOKS_EXPORT_ROOT', Path(settings.MEDIA_ROOT) / 'exports'))
+
+
+def export_path(story, fmt):
+    stamp = int(story.modified_at.timestamp() * 1_000_000)
+    return export_root() / str(story.pk) / f'{story.slug}-v{EXPORT_VERSION}-{stamp}.{fmt}'
+
+
+def remove_exports(story_id):
+    shutil.rmtree(export_root() / str(story_id), ignore_errors=True)
+
+
+def _chapters(story):
+    chapters = Chapter.objects.filter(story=story).select_related('body').order_by('order', 'pk')
+    return chapters.iterator(chunk_size=CHAPTER_CHUNK_SIZE)
+
+
+def iter_text(story):
+    yield f"{story.title}\nby {story.author.username}\n\n{story.description.strip()}\n".encode()
+    for chapter in _chapters(story):
+        yield f"\n\n{chapter.title}\n{'=' * len(chapter.title)}\n\n{chapter.content.strip()}\n".encode()
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    ZipFile target that hands out what was written so far via drain(). ZipFile
+    only seeks back into the member it is writing, so draining between members
+    keeps every seek inside the buffered tail.
+    """
+
+    def __init__(self):
+        self._buffer = io.BytesIO()
+        self._drained = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._drained + self._buffer.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence != io.SEEK_SET or offset < self._drained:
+            raise io.UnsupportedOperation("cannot seek into data already streamed")
+        self._buffer.seek(offset - self._drained)
+        return offset
+
+    def write(self, data):
+        return self._buffer.write(data)
+
+    def drain(self):
+        data = self._buffer.getvalue()
+        self._drained += len(data)
+        self._buffer = io.BytesIO()
+        return data
+
+
+def _xhtml(title, body):
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+        f'<head><title>{escape(title)}</title></head>\n<body>\n{body}\n</body>\n</html>\n'
+    )
+
+
+def _paragraphs(text):
+    # chapter text is plain; build XHTML from it directly rather than from the stored
+    # HTML, which is HTML5 (<br>) and, with the markdown renderer, has named entities
+    return linebreaks(text, autoescape=True).replace('<br>', '<br/>')
+
+
+def iter_epub(story):
+    sink = _ZipSink()
+    book = zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED)
+    # the mimetype must come first and uncompressed
+    book.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+    book.writestr('META-INF/container.xml', (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+        '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+        '</rootfiles>\n</container>\n'
+    ))
+
+    # the package and table of contents need every chapter's title, but not its text
+    toc = list(Chapter.objects.filter(story=story).order_by('order', 'pk').values_list('pk', 'title'))
+    items = ['<item id="title" href="title.xhtml" media-type="application/xhtml+xml"/>']
+    items += [f'<item id="c{pk}" href="chapter-{pk}.xhtml" media-type="application/xhtml+xml"/>' for pk, _ in toc]
+    spine = ['<itemref idref="title"/>'] + [f'<itemref idref="c{pk}"/>' for pk, _ in toc]
+    book.writestr('OEBPS/content.opf', (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">\n'
+        '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+        f'<dc:identifier id="uid">urn:dreambooks:story:{story.pk}</dc:identifier>\n'
+        f'<dc:title>{escape(story.title)}</dc:title>\n'
+        f'<dc:creator>{escape(story.author.username)}</dc:creator>\n'
+        f'<dc:language>{escape(settings.LANGUAGE_CODE)}</dc:language>\n'
+        f'<meta property="dcterms:modified">{story.modified_at.strftime("%Y-%m-%dT%H:%M:%SZ")}</meta>\n'
+        '</metadata>\n'
+        '<manifest><item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+        f'{"".join(items)}</manifest>\n'
+        f'<spine>{"".join(spine)}</spine>\n'
+        '</package>\n'
+    ))
+    entries = ''.join(f'<li><a href={quoteattr(f"chapter-{pk}.xhtml")}>{escape(title)}</a></li>' for pk, title in toc)
+    book.writestr('OEBPS/nav.xhtml', _xhtml(story.title, f'<nav epub:type="toc"><ol>{entries}</ol></nav>'))
+    book.writestr('OEBPS/title.xhtml', _xhtml(story.title, (
+        f'<h1>{escape(story.title)}</h1>\n<p>by {escape(story.author.username)}</p>\n'
+        f'{_paragraphs(story.description)}'
+    )))
+    yield sink.drain()
+
+    for chapter in _chapters(story):
+        book.writestr(f'OEBPS/chapter-{chapter.pk}.xhtml', _xhtml(
+            chapter.title, f'<h2>{escape(chapter.title)}</h2>\n{_paragraphs(chapter.content)}'))
+        yield sink.drain()
+    book.close()
+    yield sink.drain()
+
+
+GENERATORS = {
+    'txt': iter_text,
+    'epub': iter_epub,
+}
+
+
+def stream_export(story, fmt):
+    """
+    Yield the export of ``story`` while saving it to export_path(); the file is
+    moved into place only once complete, so readers never see a partial book.
+    """
+    path = export_path(story, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in GENERATORS[fmt](story):
+                tmp.write(chunk)
+                yield chunk
+        os.replace(tmp_name, path)
+    except BaseException:
+        # includes GeneratorExit when the reader disconnects mid-download
+        os.unlink(tmp_name)
+        raise
+    for stale in path.parent.glob(f'*.{fmt}'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+async def astream_export(story, fmt):
+    """
+    stream_export() for ASGI responses. Django would read a sync iterator into
+    one list before sending it, so pull one chunk at a time off a worker thread.
+    """
+    chunks = stream_export(story, fmt)
+    try:
+        while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # a no-op once finished; on disconnect it discards the partial file
+        await sync_to_async(chunks.close)()
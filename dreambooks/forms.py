@@ -1,20 +1,36 @@
 from django import forms
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
+from django.template import loader
 from django.contrib.auth import get_user_model
+from .jobs import enqueue
 from .models import Story, Genre, Chapter, Review
+from .tasks import send_email
 
 User = get_user_model()
 
 class ChapterForm(forms.ModelForm):
+    # Chapter.content is stored in ChapterBody, so it is declared here rather than generated
+    content = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 12, 'placeholder': 'Write the chapter content here...'}),
+    )
+
     class Meta:
         model = Chapter
         # adjust field names to match your model:
         fields = ['title', 'content']
         widgets = {
             'title': forms.TextInput(attrs={'placeholder': 'Chapter title'}),
-            'content': forms.Textarea(attrs={'rows': 12, 'placeholder': 'Write the chapter content here...'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['content'].initial = self.instance.content
+
+    def save(self, commit=True):
+        self.instance.content = self.cleaned_data['content']
+        return super().save(commit)
+
 class SignUpForm(UserCreationForm):
     email = forms.EmailField(required=True, help_text='Required. Enter a valid email address.')
 
@@ -66,3 +82,16 @@ class ReviewForm(forms.ModelForm):
             'rating': forms.Select(choices=[(i, f"{i} ★") for i in range(1,6)]),
             'comment': forms.Textarea(attrs={'rows':3, 'placeholder':'Write your review...'}),
         }
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Renders the reset email in the request but hands delivery to the job queue."""
+
+    def send_mail(self, subject_template_name, email_template_name, context,
+                  from_email, to_email, html_email_template_name=None):
+        subject = ''.join(loader.render_to_string(subject_template_name, context).splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = None
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+        enqueue(send_email, subject, body, from_email, [to_email], html_body=html_body)
@@ -0,0 +1,108 @@
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+# CSS width each variant is displayed at; 1x and 2x renditions are generated.
+COVER_VARIANTS = {
+    'list': {'width': 100, 'sizes': '100px'},
+    'card': {'width': 320, 'sizes': '(max-width: 720px) 100vw, 320px'},
+    'detail': {'width': 200, 'sizes': '200px'},
+}
+DENSITIES = (1, 2)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+
+def variant_name(original_name, variant, width, ext):
+    directory, filename = posixpath.split(original_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}_{variant}_{width}.{ext}')
+
+
+def _encode(image, fmt, **params):
+    buffer = BytesIO()
+    image.save(buffer, fmt, **params)
+    return ContentFile(buffer.getvalue())
+
+
+def _store(storage, name, content):
+    # variant names are deterministic, so regenerating replaces rather than renames
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, content)
+
+
+def build_cover_variants(original_name, storage=None):
+    """
+    Write resized WebP and fallback (JPEG, or PNG when the cover has transparency)
+    renditions of one stored cover and return the mapping saved on
+    ``Story.cover_variants``. Touches only the storage, never the database,
+    so it can run in a worker process.
+    """
+    storage = storage or default_storage
+    with storage.open(original_name, 'rb') as fh:
+        original = ImageOps.exif_transpose(Image.open(fh))
+        original.load()
+
+    has_alpha = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+    original = original.convert('RGBA' if has_alpha else 'RGB')
+    fallback_fmt, fallback_ext, fallback_type = (
+        ('PNG', 'png', 'image/png') if has_alpha else ('JPEG', 'jpg', 'image/jpeg')
+    )
+
+    # content-addressed storages would rename derived files; write them verbatim
+    storage = getattr(storage, 'variant_storage', storage)
+    variants = {}
+    for variant, spec in COVER_VARIANTS.items():
+        widths = sorted({min(spec['width'] * density, original.width) for density in DENSITIES})
+        webp, fallback = [], []
+        for width in widths:
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+            webp.append([width, _store(storage, variant_name(original_name, variant, width, 'webp'),
+                                       _encode(resized, 'WEBP', quality=WEBP_QUALITY, method=4))])
+            params = {'optimize': True} if has_alpha else {'quality': JPEG_QUALITY, 'optimize': True,
+                                                           'progressive': True}
+            fallback.append([width, _store(storage, variant_name(original_name, variant, width, fallback_ext),
+                                           _encode(resized, fallback_fmt, **params))])
+        variants[variant] = {'webp': webp, 'fallback': fallback, 'type': fallback_type}
+    return variants
+
+
+def delete_cover_variants(original_name, storage=None):
+    """Remove every rendition build_cover_variants wrote for ``original_name``."""
+    storage = storage or default_storage
+    storage = getattr(storage, 'variant_storage', storage)
+    directory, filename = posixpath.split(original_name)
+    variants_dir = posixpath.join(directory, 'variants')
+    stem = posixpath.splitext(filename)[0] + '_'
+    if not storage.exists(variants_dir):
+        return 0
+    removed = 0
+    for name in storage.listdir(variants_dir)[1]:
+        if name.startswith(stem):
+            storage.delete(posixpath.join(variants_dir, name))
+            removed += 1
+    return removed
+
+
+def record_cover_variants(story_id, variants):
+    """Save ``variants`` on the story without re-saving it, retiring its cached cards and pages."""
+    from .cards import bump_card_versions
+    from .models import Story
+
+    Story.objects.filter(pk=story_id).update(cover_variants=variants, modified_at=timezone.now())
+    bump_card_versions([story_id])
+
+
+def generate_cover_variants(story):
+    """Build variants for ``story.cover_image`` and record them."""
+    variants = build_cover_variants(story.cover_image.name, story.cover_image.storage) \
+        if story.cover_image else {}
+    story.cover_variants = variants
+    record_cover_variants(story.pk, variants)
+    return variants
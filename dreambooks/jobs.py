@@ -0,0 +1,139 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+DEFAULT_VISIBILITY_TIMEOUT = 300  # seconds a claimed job stays invisible to other workers
+RETRY_BACKOFF = 30  # seconds; doubled after every failed attempt
+# finished rows are deleted by purge() this long after they last ran
+DONE_RETENTION = timedelta(days=7)
+FAILED_RETENTION = timedelta(days=30)
+
+# caches whose invalidations jobs perform (card versions, pages, trending)
+_INVALIDATED_CACHES = ('DREAMBOOKS_CARD_CACHE', 'DREAMBOOKS_PAGE_CACHE')
+
+
+def check_shared_caches():
+    """
+    Outside eager mode jobs run in the `run_jobs` process, so the caches they
+    invalidate must be shared with the web processes; a per-process LocMemCache
+    would leave every web process serving stale cards and pages.
+    """
+    if getattr(settings, 'DREAMBOOKS_JOBS_EAGER', False):
+        return
+    aliases = {'default', *(getattr(settings, name, 'default') for name in _INVALIDATED_CACHES)}
+    local = sorted(alias for alias in aliases
+                   if alias in settings.CACHES and isinstance(caches[alias], LocMemCache))
+    if local:
+        raise ImproperlyConfigured(
+            f"DREAMBOOKS_JOBS_EAGER is False, so jobs run in a separate process, but the "
+            f"{', '.join(local)} cache{'s are' if len(local) > 1 else ' is'} per-process (LocMemCache). "
+            f"Use a shared backend such as FileBasedCache or RedisCache."
+        )
+
+
+def job(func):
+    """Register ``func`` so it can be enqueued by name and run by the worker."""
+    _registry[f'{func.__module__}.{func.__name__}'] = func
+    func.job_name = f'{func.__module__}.{func.__name__}'
+    return func
+
+
+def enqueue(func, *args, max_attempts=3, delay=0, **kwargs):
+    """
+    Queue ``func(*args, **kwargs)`` to run outside the request. Arguments must
+    be JSON-serialisable. Rows are written inside the caller's transaction; with
+    DREAMBOOKS_JOBS_EAGER the job instead runs inline once that transaction commits,
+    and ``delay`` is ignored: there is no worker to hold it back, and callers that
+    schedule with a delay (the trending refresh) are already rate-limited upstream.
+    """
+    name = getattr(func, 'job_name', func)
+    if name not in _registry:
+        raise ValueError(f"{name} is not a registered job")
+
+    if getattr(settings, 'DREAMBOOKS_JOBS_EAGER', False):
+        transaction.on_commit(lambda: _registry[name](*args, **kwargs))
+        return None
+
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def _claimable(now):
+    # queued and due, or claimed by a worker whose visibility timeout ran out
+    return (Q(status=Job.QUEUED, run_after__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now))
+
+
+def purge(now=None):
+    """Delete jobs that finished more than DONE_RETENTION (failed: FAILED_RETENTION) ago."""
+    now = now or timezone.now()
+    deleted, _ = Job.objects.filter(
+        Q(status=Job.DONE, updated_at__lt=now - DONE_RETENTION)
+        | Q(status=Job.FAILED, updated_at__lt=now - FAILED_RETENTION)
+    ).delete()
+    return deleted
+
+
+def claim(limit, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+    """Atomically claim up to ``limit`` due jobs; returns their ids."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(_claimable(now)).order_by('run_after', 'id').values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidates:
+        # the conditional UPDATE is the lock: only one worker can flip a given row
+        if Job.objects.filter(_claimable(now), pk=job_id).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+        ):
+            claimed.append(job_id)
+    return claimed
+
+
+def run_job(job_id):
+    """Execute one claimed job and record the outcome. Safe to call from a thread or process."""
+    close_old_connections()
+    try:
+        record = Job.objects.get(pk=job_id)
+        func = _registry.get(record.name)
+        try:
+            if func is None:
+                raise LookupError(f"Unknown job {record.name}")
+            func(*record.args, **record.kwargs)
+        except Exception:
+            error = traceback.format_exc()
+            logger.warning("Job %s (%s) failed on attempt %s", record.pk, record.name, record.attempts)
+            if record.attempts >= record.max_attempts:
+                Job.objects.filter(pk=record.pk).update(status=Job.FAILED, last_error=error, locked_until=None)
+            else:
+                backoff = RETRY_BACKOFF * 2 ** (record.attempts - 1)
+                Job.objects.filter(pk=record.pk).update(
+                    status=Job.QUEUED, last_error=error, locked_until=None,
+                    run_after=timezone.now() + timedelta(seconds=backoff),
+                )
+            return False
+        Job.objects.filter(pk=record.pk).update(status=Job.DONE, locked_until=None)
+        return True
+    finally:
+        close_old_connections()
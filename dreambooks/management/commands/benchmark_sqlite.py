@@ -0,0 +1,56 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from dreambooks.benchmarks import benchmark_database, run_sqlite_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway SQLite database file and compare concurrent read/write throughput "
+        "with SQLite's defaults against DREAMBOOKS_SQLITE_PRAGMAS and CONN_MAX_AGE, e.g. "
+        "--settings dreamdimension.settings_production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stories', type=int, default=200, help='Number of stories to seed')
+        parser.add_argument('--chapters', type=int, default=5, help='Number of chapters per story')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic dataset')
+        parser.add_argument('--readers', type=int, default=8, help='Threads reading chapters')
+        parser.add_argument('--writers', type=int, default=2, help='Threads running write transactions')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per configuration')
+        parser.add_argument('--output', help='Write the JSON report to this file (default: stdout)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"benchmark_sqlite tunes SQLite; the database is {connection.vendor}")
+        if not getattr(settings, 'DREAMBOOKS_SQLITE_PRAGMAS', None):
+            raise CommandError(
+                "DREAMBOOKS_SQLITE_PRAGMAS is empty; run with --settings dreamdimension.settings_production"
+            )
+        # WAL needs a real file; the default SQLite test database lives in memory
+        with tempfile.TemporaryDirectory() as tmp:
+            with benchmark_database(options['stories'], options['chapters'], options['seed'],
+                                    path=Path(tmp) / 'benchmark.sqlite3'):
+                report = run_sqlite_benchmark(readers=options['readers'], writers=options['writers'],
+                                              duration=options['duration'], seed=options['seed'])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        for profile in ('default', 'tuned'):
+            for kind in ('read', 'write'):
+                result = report[profile][kind]
+                self.stderr.write(
+                    f"{profile:8} {kind:5}: {result['operations_per_second']:8.1f} ops/s  "
+                    f"p50 {result.get('p50_ms', 0):.1f} ms  p95 {result.get('p95_ms', 0):.1f} ms  "
+                    f"errors {result['errors']}"
+                )
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dreambooks.benchmarks import VIEW_BUDGETS, benchmark_database, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, then record queries per request and "
+        "p50/p95 render time for the main read views. Fails if a view exceeds its query budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stories', type=int, default=200, help='Number of stories to seed')
+        parser.add_argument('--chapters', type=int, default=5, help='Number of chapters per story')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic dataset')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--output', help='Write the JSON report to this file (default: stdout)')
+        parser.add_argument(
+            '--existing-db',
+            action='store_true',
+            help='Benchmark the configured database as-is instead of a seeded test database',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1")
+        with benchmark_database(options['stories'], options['chapters'], options['seed'],
+                                existing=options['existing_db']):
+            report = run_benchmarks(iterations=options['iterations'])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        for name, result in report['views'].items():
+            line = (f"{name:15} {result['queries']:3d} queries (budget {result['budget']}) "
+                    f"p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms")
+            self.stderr.write(self.style.ERROR(line) if result['over_budget'] else line)
+
+        over = [name for name, result in report['views'].items() if result['over_budget']]
+        if over:
+            raise CommandError(f"Query budget exceeded for: {', '.join(over)}")
+        missing = sorted(set(VIEW_BUDGETS) - set(report['views']))
+        if missing:
+            raise CommandError(f"No data to benchmark: {', '.join(missing)}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from dreambooks.cards import card_cache_is_shared, card_cache_stats, reset_card_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show (and optionally reset) the story card cache hit/miss counters. With a per-process "
+        "cache (LocMemCache) this process has none; staff can read the web process's at "
+        "/stats/card-cache/ instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters to zero')
+
+    def handle(self, *args, **options):
+        if not card_cache_is_shared():
+            self.stderr.write(self.style.WARNING(
+                "The card cache is local to each process, so these counters are this command's own. "
+                "Use a shared cache backend or the /stats/card-cache/ page."
+            ))
+        hits, misses = card_cache_stats()
+        total = hits + misses
+        ratio = (hits / total * 100) if total else 0
+        self.stdout.write(f"Card cache hits: {hits}, misses: {misses}, hit ratio: {ratio:.1f}%")
+        if options['reset']:
+            reset_card_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from dreambooks.benchmarks import benchmark_database, explain_views
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database (or use --existing-db, e.g. a million-row copy), "
+        "run EXPLAIN QUERY PLAN on every query of the main read views and report full table scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stories', type=int, default=200, help='Number of stories to seed')
+        parser.add_argument('--chapters', type=int, default=5, help='Number of chapters per story')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic dataset')
+        parser.add_argument('--output', help='Write the JSON report to this file (default: stdout)')
+        parser.add_argument(
+            '--existing-db',
+            action='store_true',
+            help='Explain against the configured database as-is instead of a seeded test database',
+        )
+        parser.add_argument(
+            '--allow-scan',
+            action='append',
+            default=[],
+            metavar='TABLE',
+            help='Table a full scan is acceptable on (small lookup tables); may be repeated',
+        )
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any other table is scanned in full')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"explain_views reads SQLite query plans; the database is {connection.vendor}")
+        with benchmark_database(options['stories'], options['chapters'], options['seed'],
+                                existing=options['existing_db']):
+            report = explain_views()
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        allowed = set(options['allow_scan'])
+        offenders = []
+        for name, result in report['views'].items():
+            scans = sorted({table for query in result['queries'] for table in query['full_scans']} - allowed)
+            sorts = sum(query['temp_sort'] for query in result['queries'])
+            line = (f"{name:18} {len(result['queries']):3d} selects  "
+                    f"full scans: {', '.join(scans) or '-'}  temp sorts: {sorts}")
+            self.stderr.write(self.style.ERROR(line) if scans else line)
+            if scans:
+                offenders.append(name)
+
+        if offenders and options['fail_on_scan']:
+            raise CommandError(f"Full table scans in: {', '.join(offenders)}")
@@ -0,0 +1,72 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dreambooks.images import delete_cover_variants
+from dreambooks.models import CoverBlob, Story
+from dreambooks.storage import cover_storage
+
+
+class Command(BaseCommand):
+    help = "Delete cover files (and their variants) that no story references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+        parser.add_argument(
+            '--scan',
+            action='store_true',
+            help='Also walk the covers directory for files with no CoverBlob row (legacy or failed uploads)',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            help='Minutes a file must be unreferenced before it is collected (protects in-flight uploads)',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = cover_storage()
+        self.dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        removed = 0
+
+        for blob in CoverBlob.objects.filter(refcount__lte=0, unreferenced_at__lt=cutoff):
+            # the refcount is advisory; never delete a file a story still points at
+            if Story.objects.filter(cover_image=blob.name).exists():
+                CoverBlob.objects.filter(pk=blob.pk).update(
+                    refcount=Story.objects.filter(cover_image=blob.name).count(), unreferenced_at=None,
+                )
+                continue
+            removed += self.collect(blob.name)
+            if not self.dry_run:
+                blob.delete()
+
+        if options['scan']:
+            known = set(CoverBlob.objects.values_list('name', flat=True))
+            known.update(Story.objects.exclude(cover_image='').values_list('cover_image', flat=True))
+            for name in self.walk(self.storage.prefix):
+                if name not in known and self.storage.get_modified_time(name) < cutoff:
+                    removed += self.collect(name)
+
+        verb = "Would delete" if self.dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} orphaned cover file(s)."))
+
+    def collect(self, name):
+        self.stdout.write(f"  {name}")
+        if self.dry_run or not self.storage.exists(name):
+            return 1
+        self.storage.delete(name)
+        delete_cover_variants(name, self.storage)
+        return 1
+
+    def walk(self, directory):
+        if not self.storage.exists(directory):
+            return
+        directories, files = self.storage.listdir(directory)
+        for filename in files:
+            yield posixpath.join(directory, filename)
+        for sub in directories:
+            if sub != 'variants':
+                yield from self.walk(posixpath.join(directory, sub))
@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from dreambooks.images import build_cover_variants, record_cover_variants
+from dreambooks.models import Story
+
+
+def _init_process():
+    # spawn-based platforms start workers without Django configured
+    django.setup()
+
+
+def _build(args):
+    story_id, name = args
+    # the storage covers are saved with, not default_storage
+    storage = Story._meta.get_field('cover_image').storage
+    try:
+        return story_id, build_cover_variants(name, storage), None
+    except Exception as exc:  # a broken upload must not stop the backfill
+        return story_id, None, f"{type(exc).__name__}: {exc}"
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/fallback cover variants for stories that have a cover image."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of image processes')
+        parser.add_argument('--force', action='store_true', help='Regenerate covers that already have variants')
+
+    def handle(self, *args, **options):
+        stories = Story.objects.exclude(cover_image='').exclude(cover_image__isnull=True)
+        if not options['force']:
+            stories = stories.filter(cover_variants={})
+        jobs = list(stories.values_list('id', 'cover_image'))
+
+        done = failed = 0
+        connections.close_all()  # forked workers must not share this process's connections
+        # workers only read and write image files; all database writes happen here
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_process) as pool:
+            for story_id, variants, error in pool.map(_build, jobs, chunksize=8):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"Story {story_id}: {error}")
+                    continue
+                # also moves modified_at, so ETags and cached pages pick up the srcset
+                record_cover_variants(story_id, variants)
+                done += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Cover variants generated: {done}, failed: {failed}"))
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from dreambooks.benchmarks import benchmark_database, run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and compare throughput of the read views "
+        "served through the WSGI handler versus the ASGI handler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stories', type=int, default=200, help='Number of stories to seed')
+        parser.add_argument('--chapters', type=int, default=5, help='Number of chapters per story')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic dataset')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per handler')
+        parser.add_argument('--output', help='Write the JSON report to this file (default: stdout)')
+        parser.add_argument(
+            '--existing-db',
+            action='store_true',
+            help='Load test the configured database as-is instead of a seeded test database',
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(options['stories'], options['chapters'], options['seed'],
+                                existing=options['existing_db']):
+            report = run_load_test(concurrency=options['concurrency'], requests=options['requests'])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        for handler in ('wsgi', 'asgi'):
+            result = report[handler]
+            self.stderr.write(
+                f"{handler}: {result['requests_per_second']:.1f} req/s  p50 {result['p50_ms']:.1f} ms  "
+                f"p95 {result['p95_ms']:.1f} ms  errors {result['errors']}"
+            )
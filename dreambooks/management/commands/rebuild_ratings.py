@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from dreambooks.models import Story
+from dreambooks.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored rating aggregates on every Story from its reviews."
+
+    def handle(self, *args, **options):
+        rebuild_ratings()
+        rated = Story.objects.filter(rating_count__gt=0).count()
+        self.stdout.write(self.style.SUCCESS(f"Ratings rebuilt. Stories with reviews: {rated}"))
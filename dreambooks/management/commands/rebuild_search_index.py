@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dreambooks.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for stories and chapters."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index rebuilt with {type(backend).__name__}. Stories indexed: {count} (with their chapters)"
+        ))
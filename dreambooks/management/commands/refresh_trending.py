@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dreambooks.analytics import refresh_trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll hourly view buckets up into daily ones and recompute every Story's trending score. "
+        "Also runs as a job shortly after views come in."
+    )
+
+    def handle(self, *args, **options):
+        trending = refresh_trending()
+        self.stdout.write(self.style.SUCCESS(f"Trending refreshed. Stories with recent views: {trending}"))
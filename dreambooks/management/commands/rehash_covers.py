@@ -0,0 +1,57 @@
+import re
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from dreambooks.cards import bump_card_versions
+from dreambooks.images import build_cover_variants
+from dreambooks.models import CoverBlob, Story
+from dreambooks.storage import cover_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move covers stored before content addressing to their hashed names, so byte-identical "
+        "uploads share one file. The old files are left for gc_covers to delete after its grace period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        storage = cover_storage()
+        hashed = re.compile(rf'{re.escape(storage.prefix)}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.\w+)?')
+        legacy = (Story.objects.exclude(cover_image='').exclude(cover_image__isnull=True)
+                  .order_by('cover_image').values_list('cover_image', flat=True).distinct())
+
+        moved, targets, variants = 0, set(), {}
+        for old_name in legacy:
+            if hashed.fullmatch(old_name):
+                continue
+            if not storage.exists(old_name):
+                self.stderr.write(f"  {old_name}: file missing, skipped")
+                continue
+            if options['dry_run']:
+                with storage.open(old_name, 'rb') as fh:
+                    new_name = storage.hashed_name(old_name, File(fh))
+            else:
+                with storage.open(old_name, 'rb') as fh:
+                    new_name = storage.save(old_name, File(fh))  # an identical file is reused, not copied
+                if new_name not in variants:
+                    variants[new_name] = build_cover_variants(new_name, storage)
+                with transaction.atomic():
+                    story_ids = list(Story.objects.filter(cover_image=old_name).values_list('pk', flat=True))
+                    # update() skips the cover signals, so the reference counts move here
+                    Story.objects.filter(pk__in=story_ids).update(
+                        cover_image=new_name, cover_variants=variants[new_name], modified_at=timezone.now())
+                    CoverBlob.adjust(new_name, len(story_ids))
+                    CoverBlob.adjust(old_name, -len(story_ids))
+                bump_card_versions(story_ids)
+            self.stdout.write(f"  {old_name} -> {new_name}")
+            moved += 1
+            targets.add(new_name)
+
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} cover(s) onto {len(targets)} distinct file(s)."))
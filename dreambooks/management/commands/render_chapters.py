@@ -0,0 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from dreambooks.compression import decompress_text, default_codec
+from dreambooks.models import ChapterBody, Story
+from dreambooks.rendering import current_renderer
+
+
+def _init_process():
+    # spawn-based platforms start workers without Django configured
+    django.setup()
+
+
+def _render(args):
+    chapter_id, codec, data, target_codec, renderer = args
+    try:
+        body = ChapterBody.build(chapter_id, decompress_text(codec, data), codec=target_codec, renderer=renderer)
+    except Exception as exc:  # one unreadable body must not stop the run
+        return chapter_id, None, f"{type(exc).__name__}: {exc}"
+    return chapter_id, body, None
+
+
+class Command(BaseCommand):
+    help = "Re-render stored chapter HTML, e.g. after changing DREAMBOOKS_CHAPTER_RENDERER or a renderer version."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of rendering processes')
+        parser.add_argument('--batch-size', type=int, default=500, help='Chapters written per transaction')
+        parser.add_argument('--force', action='store_true', help='Re-render chapters that are already current')
+
+    def handle(self, *args, **options):
+        renderer, codec = current_renderer(), default_codec()
+        bodies = ChapterBody.objects.order_by('pk')
+        if not options['force']:
+            bodies = bodies.exclude(renderer=renderer)
+        ids = list(bodies.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+
+        done = failed = 0
+        # workers only decompress, render and compress; all database access happens here
+        # forked workers must not share the parent's SQLite connection
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_process) as pool:
+            for start in range(0, len(ids), batch_size):
+                rows = ChapterBody.objects.filter(pk__in=ids[start:start + batch_size]) \
+                    .values_list('pk', 'codec', 'data', 'chapter__story_id')
+                story_ids = set()
+                jobs = []
+                for pk, body_codec, data, story_id in rows:
+                    jobs.append((pk, body_codec, bytes(data), codec, renderer))
+                    story_ids.add(story_id)
+
+                rendered = []
+                for chapter_id, body, error in pool.map(_render, jobs, chunksize=16):
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"Chapter {chapter_id}: {error}")
+                    else:
+                        rendered.append(body)
+                with transaction.atomic():
+                    ChapterBody.objects.bulk_update(
+                        rendered, ['codec', 'data', 'content_hash', 'renderer', 'html_codec', 'html_data'])
+                    # new HTML means new pages: move the stories' validators and page-cache keys
+                    Story.objects.filter(pk__in=story_ids).touch()
+                done += len(rendered)
+                self.stdout.write(f"Rendered {done}/{len(ids)} chapters")
+
+        self.stdout.write(self.style.SUCCESS(f"Chapters rendered with {renderer}: {done}, failed: {failed}"))
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from dreambooks.jobs import DEFAULT_VISIBILITY_TIMEOUT, claim, purge, run_job
+
+
+def _init_process():
+    # spawn-based platforms start workers without Django configured
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Run queued dreambooks jobs (cover variants, search indexing, email)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Jobs run at the same time')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                            help='Run jobs in a thread pool (I/O-bound) or a process pool (CPU-bound)')
+        parser.add_argument('--visibility-timeout', type=int, default=DEFAULT_VISIBILITY_TIMEOUT,
+                            help='Seconds before a job claimed by a dead worker is retried')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+        parser.add_argument('--purge-interval', type=float, default=3600,
+                            help='Seconds between deletions of long-finished jobs (0 disables)')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        if options['mode'] == 'process':
+            # forked workers must not share the parent's SQLite connection
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=concurrency, initializer=_init_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=concurrency)
+
+        done = failed = 0
+        running = set()
+        purged_at = None
+        try:
+            with pool:
+                while True:
+                    if options['purge_interval'] and (
+                        purged_at is None or time.monotonic() - purged_at >= options['purge_interval']
+                    ):
+                        purge()
+                        purged_at = time.monotonic()
+                    free = concurrency - len(running)
+                    if free:
+                        running.update(pool.submit(run_job, job_id)
+                                       for job_id in claim(free, options['visibility_timeout']))
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    finished, running = wait(running, timeout=options['poll_interval'],
+                                             return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        if future.result():
+                            done += 1
+                        else:
+                            failed += 1
+        except KeyboardInterrupt:
+            # unfinished jobs become claimable again once their visibility timeout passes
+            self.stdout.write("Stopping; waiting for running jobs to finish.")
+
+        self.stdout.write(self.style.SUCCESS(f"Jobs done: {done}, failed: {failed}"))
@@ -1,14 +1,37 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils.text import slugify
 from faker import Faker
+from multiprocessing import Pool
 import random
 
-from dreambooks.models import Story, Chapter
+from dreambooks.models import Story, Chapter, ChapterBody, Genre, Review
+from dreambooks.ratings import rebuild_ratings
+from dreambooks.search import get_backend
 
 fake = Faker()
 User = get_user_model()
 
 
+def generate_text_batch(args):
+    """Fake text for one batch of stories. Runs in a worker process, so it never touches the DB."""
+    seed, batch_index, size, chapters, chapter_sentences = args
+    batch_fake = Faker()
+    batch_fake.seed_instance(seed * 100003 + batch_index)
+    return [
+        {
+            'title': batch_fake.sentence(nb_words=5).rstrip('.'),
+            'description': batch_fake.paragraph(nb_sentences=3),
+            'chapters': [batch_fake.paragraph(nb_sentences=chapter_sentences) for _ in range(chapters)],
+            'comment': batch_fake.sentence(nb_words=12),
+        }
+        for _ in range(size)
+    ]
+
+
 class Command(BaseCommand):
     help = "Seed the database with random stories and chapters."
 
@@ -25,8 +48,30 @@ class Command(BaseCommand):
             default=3,
             help='Number of chapters per story'
         )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Seed for Faker and random so runs are reproducible'
+        )
+
+        bulk = parser.add_argument_group('bulk mode', 'High-volume seeding with bulk_create')
+        bulk.add_argument('--bulk', action='store_true', help='Insert in batches with bulk_create')
+        bulk.add_argument('--batch-size', type=int, default=1000, help='Stories per batch')
+        bulk.add_argument('--users', type=int, default=50, help='Number of authors/reviewers to create')
+        bulk.add_argument('--reviews', type=int, default=5, help='Maximum reviews per story')
+        bulk.add_argument('--genres-per-story', type=int, default=3, help='Maximum genres per story')
+        bulk.add_argument('--chapter-sentences', type=int, default=10, help='Sentences per chapter')
+        bulk.add_argument('--workers', type=int, default=1, help='Processes generating Faker text')
 
     def handle(self, *args, **options):
+        if options['seed'] is not None:
+            Faker.seed(options['seed'])
+            random.seed(options['seed'])
+
+        if options['bulk']:
+            return self.handle_bulk(**options)
+
         count = options['count']
         chapters_count = options['chapters']
 
@@ -62,3 +107,97 @@ class Command(BaseCommand):
             )
 
         self.stdout.write(self.style.SUCCESS("Seeding complete!"))
+
+    def handle_bulk(self, **options):
+        seed = options['seed'] if options['seed'] is not None else random.randrange(1 << 30)
+        rng = random.Random(seed)
+        count, batch_size = options['count'], options['batch_size']
+
+        if not Genre.objects.exists():
+            call_command('seed_genres', stdout=self.stdout)
+        genre_ids = list(Genre.objects.values_list('id', flat=True))
+        users = self.bulk_users(options['users'], seed)
+
+        # slugs are allocated here in memory instead of one exists() query per story
+        used_slugs = set(Story.objects.values_list('slug', flat=True).iterator())
+
+        jobs = [
+            (seed, index, min(batch_size, count - start), options['chapters'], options['chapter_sentences'])
+            for index, start in enumerate(range(0, count, batch_size))
+        ]
+        created = 0
+        with Pool(options['workers']) if options['workers'] > 1 else _InlinePool() as pool:
+            # imap keeps batch order, so the output only depends on --seed
+            for batch in pool.imap(generate_text_batch, jobs):
+                self.insert_batch(batch, rng, users, genre_ids, used_slugs, options)
+                created += len(batch)
+                self.stdout.write(f"Inserted {created}/{count} stories")
+
+        # bulk_create skips save() and signals, so rebuild the derived data once
+        rebuild_ratings()
+        get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Bulk seeding complete! Seed: {seed}"))
+
+    def bulk_users(self, count, seed):
+        prefix = f"seed_{seed}_"
+        existing = set(User.objects.filter(username__startswith=prefix).values_list('username', flat=True))
+        password = make_password("password123")  # hash once, not per user
+        User.objects.bulk_create([
+            User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", password=password)
+            for i in range(count) if f"{prefix}{i}" not in existing
+        ])
+        return list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+    def unique_slug(self, title, used_slugs):
+        base_slug = slugify(title) or 'story'
+        slug, counter = base_slug, 1
+        while slug in used_slugs:
+            slug = f"{base_slug}-{counter}"
+            counter += 1
+        used_slugs.add(slug)
+        return slug
+
+    @transaction.atomic
+    def insert_batch(self, batch, rng, users, genre_ids, used_slugs, options):
+        stories = Story.objects.bulk_create([
+            Story(
+                title=item['title'],
+                description=item['description'],
+                author=rng.choice(users),
+                slug=self.unique_slug(item['title'], used_slugs),
+            )
+            for item in batch
+        ])
+
+        chapters, texts, reviews, story_genres = [], [], [], []
+        for story, item in zip(stories, batch):
+            for i, content in enumerate(item['chapters'], start=1):
+                chapters.append(Chapter(story=story, title=f"Chapter {i}", order=i))
+                texts.append(content)
+            for reviewer in rng.sample(users, min(rng.randint(0, options['reviews']), len(users))):
+                reviews.append(Review(story=story, author=reviewer, rating=rng.randint(1, 5),
+                                      comment=item['comment']))
+            for genre_id in rng.sample(genre_ids, min(rng.randint(1, options['genres_per_story']),
+                                                      len(genre_ids))):
+                story_genres.append(Story.genres.through(story_id=story.pk, genre_id=genre_id))
+
+        Chapter.objects.bulk_create(chapters, batch_size=options['batch_size'])
+        ChapterBody.objects.bulk_create(
+            [ChapterBody.build(chapter.pk, text) for chapter, text in zip(chapters, texts)],
+            batch_size=options['batch_size'],
+        )
+        Review.objects.bulk_create(reviews, batch_size=options['batch_size'])
+        Story.genres.through.objects.bulk_create(story_genres, batch_size=options['batch_size'])
+
+
+class _InlinePool:
+    """Stand-in for multiprocessing.Pool when --workers is 1."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def imap(self, func, iterable):
+        return map(func, iterable)
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:03
+
+from django.db import migrations, models
+from django.db.models import Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_ratings(apps, schema_editor):
+    Story = apps.get_model('dreambooks', 'Story')
+    Review = apps.get_model('dreambooks', 'Review')
+    reviews = Review.objects.filter(story=OuterRef('pk')).order_by().values('story')
+    rating_sum = Subquery(reviews.annotate(s=Sum('rating')).values('s'))
+    rating_count = Subquery(reviews.annotate(c=Count('pk')).values('c'))
+    Story.objects.update(
+        rating_sum=Coalesce(rating_sum, Value(0)),
+        rating_count=Coalesce(rating_count, Value(0)),
+        avg_rating=Cast(rating_sum, FloatField()) / Cast(rating_count, FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0006_contactmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='avg_rating',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS dreambooks_search "
+        "USING fts5(story_id UNINDEXED, title, body, tokenize='porter unicode61')"
+    )
+    # index whatever is already in the database
+    schema_editor.execute(
+        "INSERT INTO dreambooks_search (rowid, story_id, title, body) "
+        "SELECT id * 2, id, title, description FROM dreambooks_story"
+    )
+    schema_editor.execute(
+        "INSERT INTO dreambooks_search (rowid, story_id, title, body) "
+        "SELECT id * 2 + 1, story_id, title, content FROM dreambooks_chapter"
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS dreambooks_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0007_story_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base', models.CharField(max_length=255, unique=True)),
+                ('last', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
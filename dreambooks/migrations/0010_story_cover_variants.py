@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0009_slugcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
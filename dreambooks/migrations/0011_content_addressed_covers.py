@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:13
+
+import dreambooks.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_cover_references(apps, schema_editor):
+    Story = apps.get_model('dreambooks', 'Story')
+    CoverBlob = apps.get_model('dreambooks', 'CoverBlob')
+    references = (
+        Story.objects.exclude(cover_image='').exclude(cover_image__isnull=True)
+        .values('cover_image').annotate(n=Count('id')).order_by()
+    )
+    CoverBlob.objects.bulk_create([
+        CoverBlob(name=row['cover_image'], refcount=row['n']) for row in references
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0010_story_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='story',
+            name='cover_image',
+            field=models.ImageField(blank=True, null=True, storage=dreambooks.storage.cover_storage, upload_to='covers/'),
+        ),
+        migrations.RunPython(count_cover_references, migrations.RunPython.noop),
+    ]
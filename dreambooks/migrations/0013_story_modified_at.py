@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_updated_at(apps, schema_editor):
+    Story = apps.get_model('dreambooks', 'Story')
+    Story.objects.update(modified_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0012_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:40
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of dreambooks.compression's zlib path, so later codec changes
+# don't alter what this migration writes.
+MIN_COMPRESS_BYTES = 256
+
+
+def move_content_to_bodies(apps, schema_editor):
+    Chapter = apps.get_model('dreambooks', 'Chapter')
+    ChapterBody = apps.get_model('dreambooks', 'ChapterBody')
+    batch = []
+    for chapter_id, content in Chapter.objects.values_list('id', 'content').iterator(chunk_size=500):
+        data = content.encode('utf-8')
+        codec = 'none'
+        if len(data) >= MIN_COMPRESS_BYTES:
+            compressed = zlib.compress(data, 6)
+            if len(compressed) < len(data):
+                codec, data = 'zlib', compressed
+        batch.append(ChapterBody(chapter_id=chapter_id, codec=codec, data=data))
+        if len(batch) == 500:
+            ChapterBody.objects.bulk_create(batch)
+            batch = []
+    ChapterBody.objects.bulk_create(batch)
+
+
+def restore_content(apps, schema_editor):
+    Chapter = apps.get_model('dreambooks', 'Chapter')
+    ChapterBody = apps.get_model('dreambooks', 'ChapterBody')
+    for body in ChapterBody.objects.iterator(chunk_size=500):
+        data = bytes(body.data)
+        if body.codec == 'zlib':
+            data = zlib.decompress(data)
+        elif body.codec != 'none':
+            raise RuntimeError(f"Can't restore chapter {body.chapter_id} stored with {body.codec}")
+        Chapter.objects.filter(pk=body.chapter_id).update(content=data.decode('utf-8'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0013_story_modified_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterBody',
+            fields=[
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='dreambooks.chapter')),
+                ('codec', models.CharField(default='none', max_length=10)),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        # a default lets the column be re-added when unapplying
+        migrations.AlterField(
+            model_name='chapter',
+            name='content',
+            field=models.TextField(default=''),
+        ),
+        migrations.RunPython(move_content_to_bodies, restore_content),
+        migrations.RemoveField(
+            model_name='chapter',
+            name='content',
+        ),
+    ]
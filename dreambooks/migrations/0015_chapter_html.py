@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0014_chapterbody'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapterbody',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='chapterbody',
+            name='html_codec',
+            field=models.CharField(default='none', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='chapterbody',
+            name='html_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='chapterbody',
+            name='renderer',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0015_chapter_html'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='story',
+            name='avg_rating',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chapter',
+            index=models.Index(fields=['story', 'order'], name='dreambooks_chapter_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['user', 'created_at'], name='dreambooks_contact_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['created_at'], name='dreambooks_contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['author', 'created_at'], name='dreambooks_review_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['updated_at', 'id'], name='dreambooks_story_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['created_at', 'id'], name='dreambooks_story_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['avg_rating', 'created_at', 'id'], name='dreambooks_story_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['author', 'created_at'], name='dreambooks_story_author_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0017_readingprogress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoryViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('start', models.DateTimeField()),
+                ('story_views', models.PositiveIntegerField(default=0)),
+                ('chapter_views', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['trending_score', 'id'], name='dreambooks_story_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='storyviewbucket',
+            name='story',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dreambooks.story'),
+        ),
+        migrations.AddIndex(
+            model_name='storyviewbucket',
+            index=models.Index(fields=['period', 'start'], name='dreambooks_views_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='storyviewbucket',
+            constraint=models.UniqueConstraint(fields=('story', 'period', 'start'), name='unique_view_bucket'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:42
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+
+def backfill_rating_scores(apps, schema_editor):
+    # the prior as of this migration (dreambooks.ratings.PRIOR_MEAN / PRIOR_WEIGHT)
+    Story = apps.get_model('dreambooks', 'Story')
+    Story.objects.filter(rating_count__gt=0).update(
+        rating_score=(Value(5 * 3.0) + Cast(F('rating_sum'), FloatField()))
+        / (Value(5.0) + Cast(F('rating_count'), FloatField())),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0018_view_analytics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='story',
+            name='dreambooks_story_rating_idx',
+        ),
+        migrations.AddField(
+            model_name='story',
+            name='rating_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='story',
+            index=models.Index(fields=['rating_score', 'created_at', 'id'], name='dreambooks_story_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:05
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_unreferenced_at(apps, schema_editor):
+    # when they became unreferenced is unknown; start their grace period now
+    CoverBlob = apps.get_model('dreambooks', 'CoverBlob')
+    CoverBlob.objects.filter(refcount__lte=0).update(unreferenced_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0019_story_rating_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coverblob',
+            name='unreferenced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_unreferenced_at, migrations.RunPython.noop),
+    ]
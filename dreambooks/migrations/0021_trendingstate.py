@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:06
+
+from django.db import migrations, models
+
+
+def create_state(apps, schema_editor):
+    apps.get_model('dreambooks', 'TrendingState').objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dreambooks', '0020_coverblob_unreferenced_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('scheduled_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_state, migrations.RunPython.noop),
+    ]
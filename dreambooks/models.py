@@ -1,7 +1,14 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 from django.utils.text import slugify
 
+from .compression import compress_text, decompress_text
+from .rendering import content_hash, current_renderer, render_chapter
+from .storage import cover_storage
+
 class Genre(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=60, unique=True, blank=True)
@@ -14,27 +21,147 @@ class Genre(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+class SlugCounter(models.Model):
+    """Last suffix handed out per base slug, so allocating a slug costs O(1) queries."""
+    base = models.CharField(max_length=255, unique=True)
+    last = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.base} ({self.last})"
+
+    @classmethod
+    def max_existing_suffix(cls, base_slug):
+        """Highest N among stories slugged base or base-N; -1 if none. One index range scan."""
+        slugs = Story.objects.filter(
+            models.Q(slug=base_slug) | models.Q(slug__gt=f"{base_slug}-", slug__lt=f"{base_slug}.")
+        ).values_list('slug', flat=True)
+        highest = -1
+        for slug in slugs:
+            suffix = slug[len(base_slug) + 1:]
+            if slug == base_slug:
+                highest = max(highest, 0)
+            elif suffix.isdigit():
+                highest = max(highest, int(suffix))
+        return highest
+
+    @classmethod
+    def resync(cls, base_slug):
+        """Realign the counter with the stories table (e.g. after bulk inserts)."""
+        cls.objects.update_or_create(base=base_slug, defaults={'last': cls.max_existing_suffix(base_slug)})
+
+    @classmethod
+    def allocate(cls, base_slug):
+        with transaction.atomic():
+            if not cls.objects.filter(base=base_slug).update(last=F('last') + 1):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(base=base_slug, last=cls.max_existing_suffix(base_slug) + 1)
+                except IntegrityError:
+                    # another request created the counter first
+                    cls.objects.filter(base=base_slug).update(last=F('last') + 1)
+            last = cls.objects.filter(base=base_slug).values_list('last', flat=True).get()
+        return base_slug if last == 0 else f"{base_slug}-{last}"
+
+class CoverBlob(models.Model):
+    """A stored cover file and how many stories point at it; refcount 0 means collectable."""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # when refcount last dropped to (or stayed at) 0; gc_covers waits from here
+    unreferenced_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+    @classmethod
+    def _shift(cls, name, delta):
+        # conditions see the row before the update, so "still referenced" is refcount > -delta
+        return cls.objects.filter(name=name).update(
+            refcount=F('refcount') + delta,
+            unreferenced_at=models.Case(
+                models.When(refcount__gt=-delta, then=None),
+                default=models.Value(timezone.now()),
+            ),
+        )
+
+    @classmethod
+    def adjust(cls, name, delta):
+        if not name:
+            return
+        with transaction.atomic():
+            if not cls._shift(name, delta):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(name=name, refcount=max(delta, 0),
+                                           unreferenced_at=None if delta > 0 else timezone.now())
+                except IntegrityError:
+                    cls._shift(name, delta)
+
+class StoryQuerySet(models.QuerySet):
+    def for_cards(self):
+        """Everything a story card renders, in a fixed number of queries per page."""
+        return self.select_related('author').prefetch_related('genres')
+
+    def touch(self):
+        """Mark these stories' pages as changed without a full save()."""
+        return self.update(modified_at=timezone.now())
+
 class Story(models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     description = models.TextField()
-    cover_image = models.ImageField(upload_to='covers/', blank=True, null=True)
+    cover_image = models.ImageField(upload_to='covers/', storage=cover_storage, blank=True, null=True)
+    # resized WebP/fallback renditions of cover_image, see dreambooks.images
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
     genres = models.ManyToManyField(Genre, blank=True, related_name='stories')
     slug = models.SlugField(unique=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # last change to anything shown on the story's pages (chapters, reviews, genres,
+    # author); unlike updated_at it does not reorder "Newest Update". Drives HTTP validators.
+    modified_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Denormalized review aggregates, kept in sync by dreambooks.signals
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(null=True, blank=True, editable=False)
+    # Bayesian average the Top Rated lists order by (0 until reviewed), see dreambooks.ratings
+    rating_score = models.FloatField(default=0, editable=False)
+    # Popularity, kept by dreambooks.analytics: lifetime views and the decayed
+    # recent-views score home's Trending section is ordered by
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+
+    objects = StoryQuerySet.as_manager()
+
+    SLUG_ATTEMPTS = 3
+
+    class Meta:
+        # one per cursor ordering (home sections, story_list orders, profile); the
+        # trailing columns are the tie-breakers, so pages need no temporary sort
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='dreambooks_story_updated_idx'),
+            models.Index(fields=['created_at', 'id'], name='dreambooks_story_created_idx'),
+            models.Index(fields=['rating_score', 'created_at', 'id'], name='dreambooks_story_rating_idx'),
+            models.Index(fields=['author', 'created_at'], name='dreambooks_story_author_idx'),
+            models.Index(fields=['trending_score', 'id'], name='dreambooks_story_trending_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
-            # Keep incrementing until we find a unique slug
-            while Story.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        base_slug = slugify(self.title)
+        for attempt in range(self.SLUG_ATTEMPTS):
+            self.slug = SlugCounter.allocate(base_slug)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # the slug was taken behind the counter's back (bulk insert, manual slug, race)
+                if attempt == self.SLUG_ATTEMPTS - 1 or not Story.objects.filter(slug=self.slug).exists():
+                    self.slug = ''
+                    raise
+                SlugCounter.resync(base_slug)
 
     def __str__(self):
         return self.title
@@ -42,16 +169,99 @@ class Story(models.Model):
 class Chapter(models.Model):
     story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='chapters')
     title = models.CharField(max_length=200)
-    content = models.TextField()
     order = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['order']
+        indexes = [models.Index(fields=['story', 'order'], name='dreambooks_chapter_order_idx')]
 
     def __str__(self):
         return f"{self.story.title} - {self.title}"
 
+    # The text lives in ChapterBody so chapter lists and navigation only read
+    # small rows; use select_related('body') when a page shows the text.
+    _pending_content = None
+
+    @property
+    def content(self):
+        if self._pending_content is not None:
+            return self._pending_content
+        try:
+            return self.body.text
+        except ChapterBody.DoesNotExist:
+            return ''
+
+    @content.setter
+    def content(self, value):
+        self._pending_content = value
+
+    @property
+    def html(self):
+        """The chapter rendered to HTML, as stored on save."""
+        if self._pending_content is not None:
+            return mark_safe(render_chapter(self._pending_content))
+        try:
+            return self.body.html
+        except ChapterBody.DoesNotExist:
+            return ''
+
+    def save(self, *args, **kwargs):
+        # one transaction, so on_commit work triggered by post_save sees the new body
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self._pending_content is not None:
+                self.body = ChapterBody.store(self.pk, self._pending_content)
+                self._pending_content = None
+
+
+class ChapterBody(models.Model):
+    """
+    Compressed text of one chapter (see dreambooks.compression) and its HTML,
+    rendered once on save by dreambooks.rendering.
+    """
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, primary_key=True, related_name='body')
+    codec = models.CharField(max_length=10, default='none')
+    data = models.BinaryField()
+    content_hash = models.CharField(max_length=64, blank=True)
+    # name:version of the renderer html_data came from; stale ones are redone by `render_chapters`
+    renderer = models.CharField(max_length=40, blank=True)
+    html_codec = models.CharField(max_length=10, default='none')
+    html_data = models.BinaryField(default=b'')
+
+    def __str__(self):
+        return f"Body of chapter {self.chapter_id} ({self.codec}, {len(self.data)} bytes)"
+
+    @property
+    def text(self):
+        return decompress_text(self.codec, self.data)
+
+    @property
+    def html(self):
+        if self.renderer != current_renderer():
+            # not re-rendered since the renderer changed; correct, just not precomputed
+            return mark_safe(render_chapter(self.text))
+        return mark_safe(decompress_text(self.html_codec, self.html_data))
+
+    @classmethod
+    def build(cls, chapter_id, text, codec=None, renderer=None):
+        renderer = renderer or current_renderer()
+        text_codec, data = compress_text(text, codec)
+        html_codec, html_data = compress_text(render_chapter(text, renderer), codec)
+        return cls(chapter_id=chapter_id, codec=text_codec, data=data, content_hash=content_hash(text),
+                   renderer=renderer, html_codec=html_codec, html_data=html_data)
+
+    @classmethod
+    def store(cls, chapter_id, text):
+        """Save ``text`` for a chapter, skipping the render and write when nothing changed."""
+        current = cls.objects.filter(pk=chapter_id).only('content_hash', 'renderer').first()
+        if current is not None and (current.content_hash, current.renderer) == (content_hash(text),
+                                                                               current_renderer()):
+            return current
+        body = cls.build(chapter_id, text)
+        body.save()  # pk is the chapter, so this inserts or overwrites
+        return body
+
 class Review(models.Model):
     story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name="reviews")
     author = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -64,6 +274,7 @@ class Review(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['story', 'author'], name='unique_review_per_user')
         ]
+        indexes = [models.Index(fields=['author', 'created_at'], name='dreambooks_review_author_idx')]
 
     def __str__(self):
         return f"{self.author.username} - {self.story.title}"
@@ -74,5 +285,121 @@ class ContactMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='dreambooks_contact_user_idx'),
+            models.Index(fields=['created_at'], name='dreambooks_contact_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.message[:30]}"
+
+class Job(models.Model):
+    """A queued call to a function registered with dreambooks.jobs.job; run by `manage.py run_jobs`."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'], name='dreambooks_job_due_idx')]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+class ReadingProgress(models.Model):
+    """Where a reader is in a story; written in batches by dreambooks.progress."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reading_progress')
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='+')
+    chapter = models.ForeignKey(Chapter, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # how far into the chapter, in percent of its length
+    position = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'story'], name='unique_progress_per_story')
+        ]
+        # the "continue reading" shelf: one range scan per user, newest first
+        indexes = [models.Index(fields=['user', 'updated_at'], name='dreambooks_progress_shelf_idx')]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.story_id} @ {self.chapter_id} ({self.position}%)"
+
+class StoryViewBucket(models.Model):
+    """
+    Page views of one story in one hour or day, written in batches by
+    dreambooks.analytics; hourly buckets are rolled up into daily ones.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIOD_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='+')
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateTimeField()
+    story_views = models.PositiveIntegerField(default=0)
+    chapter_views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['story', 'period', 'start'], name='unique_view_bucket')
+        ]
+        indexes = [models.Index(fields=['period', 'start'], name='dreambooks_views_start_idx')]
+
+    def __str__(self):
+        return f"{self.story_id} {self.period} {self.start:%Y-%m-%d %H:%M}: {self.story_views + self.chapter_views}"
+
+
+class TrendingState(models.Model):
+    """
+    The one row recording when Story.trending_score was last recomputed and
+    until when a refresh is already scheduled. Kept in the database, not the
+    cache, so web processes and the job worker all see the same values.
+    """
+    PK = 1
+
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    scheduled_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Trending refreshed {self.refreshed_at}"
+
+    @classmethod
+    def claim_schedule(cls, now, until):
+        """True for exactly one caller per period: the one that should enqueue the next refresh."""
+        due = models.Q(scheduled_until__isnull=True) | models.Q(scheduled_until__lte=now)
+        # the conditional UPDATE is the lock: only one process can move a due stamp
+        if cls.objects.filter(due, pk=cls.PK).update(scheduled_until=until):
+            return True
+        _, created = cls.objects.get_or_create(pk=cls.PK, defaults={'scheduled_until': until})
+        return created
+
+    @classmethod
+    def mark_refreshed(cls, now):
+        cls.objects.update_or_create(pk=cls.PK, defaults={'refreshed_at': now})
+
+    @classmethod
+    async def arefreshed_at(cls):
+        return await cls.objects.filter(pk=cls.PK).values_list('refreshed_at', flat=True).afirst()
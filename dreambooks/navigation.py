@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import Chapter, Story
+
+ChapterEntry = namedtuple('ChapterEntry', ['pk', 'order', 'title'])
+
+CHAPTER_INDEX_TIMEOUT = 60 * 60 * 24
+
+
+def _index_key(story):
+    # keyed on modified_at, which every chapter save or delete moves (see
+    # dreambooks.signals), so no process can serve an index older than its story
+    return f'chapters:index:{story.pk}:{story.modified_at.timestamp()}'
+
+
+def _index_queryset(story_id):
+    return Chapter.objects.filter(story_id=story_id).order_by('order', 'pk').values_list('pk', 'order', 'title')
+
+
+def get_chapter_index(story):
+    """Ordered (pk, order, title) entries for a story's chapters, cached until the story is modified."""
+    entries = cache.get(_index_key(story))
+    if entries is None:
+        entries = list(_index_queryset(story.pk))
+        cache.set(_index_key(story), entries, CHAPTER_INDEX_TIMEOUT)
+    return [ChapterEntry(*entry) for entry in entries]
+
+
+async def aget_chapter_index(story):
+    entries = await cache.aget(_index_key(story))
+    if entries is None:
+        entries = [entry async for entry in _index_queryset(story.pk)]
+        await cache.aset(_index_key(story), entries, CHAPTER_INDEX_TIMEOUT)
+    return [ChapterEntry(*entry) for entry in entries]
+
+
+def invalidate_chapter_index(story_id):
+    """Call after bulk reorders (queryset.update) that bypass the Chapter signals."""
+    Story.objects.filter(pk=story_id).touch()
+
+
+def adjacent_chapters(story, chapter_id):
+    """(previous, next) ChapterEntry around ``chapter_id``; either may be None."""
+    return _neighbours(get_chapter_index(story), chapter_id)
+
+
+async def aadjacent_chapters(story, chapter_id):
+    return _neighbours(await aget_chapter_index(story), chapter_id)
+
+
+def _neighbours(index, chapter_id):
+    for position, entry in enumerate(index):
+        if entry.pk == chapter_id:
+            previous = index[position - 1] if position > 0 else None
+            following = index[position + 1] if position + 1 < len(index) else None
+            return previous, following
+    return None, None
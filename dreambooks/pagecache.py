@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import json
+import re
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+_HOLE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+
+def get_page_cache():
+    return caches[getattr(settings, 'DREAMBOOKS_PAGE_CACHE', 'default')]
+
+
+def hole_marker(template_name, params):
+    """
+    Placeholder left in a cached page where ``template_name`` is rendered per
+    request. Page content is autoescaped, so user text can never forge one.
+    """
+    payload = json.dumps([template_name, params], separators=(',', ':'), sort_keys=True)
+    return mark_safe(f'<!--hole:{base64.urlsafe_b64encode(payload.encode()).decode()}-->')
+
+
+def fill_holes(body, request=None, user=None):
+    """
+    Render every hole in ``body``. Pass the live ``request`` for a signed-in
+    user (context processors supply ``user`` and the CSRF token), or just
+    ``user`` to build a request-free variant such as the anonymous page.
+    """
+    def render(match):
+        template_name, params = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        context = {'user': user, **params} if user is not None else params
+        return get_template(template_name).render(context, request)
+
+    return _HOLE.sub(render, body)
+
+
+def _page_key(request, params, stamp):
+    values = [(name, request.GET.get(name)) for name in params]
+    parts = (getattr(settings, 'DREAMBOOKS_PAGE_VERSION', ''), request.path, values, repr(stamp))
+    return 'page:' + hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def cached_page(*params):
+    """
+    Cache the rendered page of an async view, keyed on the path, the query
+    ``params`` that change its content and the validator stamp that
+    dreambooks.conditional.conditional_page (which must wrap this decorator)
+    left on the request, so any change to the underlying stories, chapters or
+    reviews moves readers to a fresh entry. Anonymous readers get the stored
+    page as-is; signed-in readers get it with their holes (nav, review form,
+    author controls) rendered on top.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            stamp = getattr(request, 'page_stamp', None)
+            if stamp is None:
+                return await view_func(request, *args, **kwargs)
+
+            cache = get_page_cache()
+            key = _page_key(request, params, stamp)
+            # resolve the lazy request.user too, so filling holes doesn't load the user again
+            request.user = user = await request.auser()
+            entry = await cache.aget(key)
+            if entry is not None:
+                if not user.is_authenticated:
+                    return HttpResponse(entry['anonymous'], content_type=entry['content_type'])
+                body = await sync_to_async(fill_holes)(entry['body'], request=request)
+                return HttpResponse(body, content_type=entry['content_type'])
+
+            # render with holes left open, then store the page and fill it for this reader
+            request.page_cache_holes = True
+            response = await view_func(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            charset = response.charset
+            body = response.content.decode(charset)
+            anonymous = await sync_to_async(fill_holes)(body, user=AnonymousUser())
+            await cache.aset(key, {
+                'body': body,
+                'anonymous': anonymous,
+                'content_type': response['Content-Type'],
+            }, getattr(settings, 'DREAMBOOKS_PAGE_CACHE_TIMEOUT', 60 * 10))
+            if user.is_authenticated:
+                response.content = (await sync_to_async(fill_holes)(body, request=request)).encode(charset)
+            else:
+                response.content = anonymous.encode(charset)
+            return response
+        return wrapper
+    return decorator
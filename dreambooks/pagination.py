@@ -0,0 +1,182 @@
+import base64
+import binascii
+import json
+import operator
+from functools import cached_property, reduce
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from django.http import QueryDict
+
+
+class CursorPage:
+    """One page of a CursorPaginator; exposes the same names the templates use."""
+
+    def __init__(self, paginator, object_list, has_next, has_previous, query=None, param=None):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self._query = query
+        self._param = param
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], reverse=False)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], reverse=True)
+
+    @property
+    def next_query(self):
+        return self._querystring(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._querystring(self.previous_cursor)
+
+    def _querystring(self, cursor):
+        if cursor is None or self._param is None:
+            return None
+        query = self._query.copy() if self._query is not None else QueryDict(mutable=True)
+        query[self._param] = cursor
+        return '?' + query.urlencode()
+
+    @cached_property
+    def count(self):
+        # only issues COUNT(*) when a template actually asks for it
+        return self.paginator.count
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a fixed ordering, e.g. ('-updated_at', '-id').
+
+    Pages are addressed by opaque cursor tokens encoding the sort key of the
+    boundary row, so every page costs one indexed range query with no OFFSET
+    and no COUNT(*). NULLs sort as the smallest value (SQLite's own rule).
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = []
+        for name in ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            self.fields.append((name, descending))
+        self._model_fields = {name: self._get_field(queryset.model, name) for name, _ in self.fields}
+
+    @staticmethod
+    def _get_field(model, name):
+        # annotations (e.g. a search rank) have no model field; their values must be JSON-native
+        if name in ('id', 'pk'):
+            return model._meta.pk
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    @cached_property
+    def count(self):
+        return self.queryset.count()
+
+    def encode_cursor(self, obj, reverse=False):
+        values = []
+        for name, _ in self.fields:
+            value, field = getattr(obj, name), self._model_fields[name]
+            values.append(field.value_to_string(obj) if value is not None and field else value)
+        payload = json.dumps({'k': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Return (values, reverse) for a token, or None if it is malformed."""
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            raw = payload['k']
+            reverse = bool(payload.get('r'))
+            if len(raw) != len(self.fields):
+                return None
+            values = []
+            for (name, _), value in zip(self.fields, raw):
+                field = self._model_fields[name]
+                values.append(field.to_python(value) if value is not None and field else value)
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            return None
+        return values, reverse
+
+    def _order_by(self, reverse):
+        ordering = []
+        for name, descending in self.fields:
+            if descending != reverse:
+                ordering.append(F(name).desc(nulls_last=True))
+            else:
+                ordering.append(F(name).asc(nulls_first=True))
+        return ordering
+
+    def _after(self, values, reverse):
+        # (a, b, c) > (x, y, z) expanded into OR-of-ANDs so each branch can use an index
+        branches = []
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            if descending != reverse:
+                beyond = None if value is None else Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+            else:
+                beyond = Q(**{f'{name}__isnull': False}) if value is None else Q(**{f'{name}__gt': value})
+            if beyond is not None:
+                branches.append(equal & beyond)
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        return reduce(operator.or_, branches, Q(pk__in=[]))
+
+    def _page_queryset(self, cursor):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        values, reverse = decoded if decoded else (None, False)
+
+        qs = self.queryset.order_by(*self._order_by(reverse))
+        if values is not None:
+            qs = qs.filter(self._after(values, reverse))
+        return qs[:self.per_page + 1], values, reverse
+
+    def _make_page(self, rows, values, reverse, query, param):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            return CursorPage(self, rows, has_next=True, has_previous=has_more, query=query, param=param)
+        return CursorPage(self, rows, has_next=has_more, has_previous=values is not None,
+                          query=query, param=param)
+
+    def page(self, cursor=None, query=None, param=None):
+        qs, values, reverse = self._page_queryset(cursor)
+        return self._make_page(list(qs), values, reverse, query, param)
+
+    async def apage(self, cursor=None, query=None, param=None):
+        """Async twin of page(); the rows (and any prefetches) load via the async ORM."""
+        qs, values, reverse = self._page_queryset(cursor)
+        return self._make_page([obj async for obj in qs], values, reverse, query, param)
+
+    def get_page(self, request, param, exclude=()):
+        """Read the cursor from ``request.GET[param]``; links keep the other query params."""
+        query = request.GET.copy()
+        for name in exclude:
+            query.pop(name, None)
+        return self.page(query.get(param), query=query, param=param)
+
+    async def aget_page(self, request, param, exclude=()):
+        query = request.GET.copy()
+        for name in exclude:
+            query.pop(name, None)
+        return await self.apage(query.get(param), query=query, param=param)
@@ -0,0 +1,103 @@
+"""
+Reading progress: which chapter of each story a reader is on, and how far in.
+
+Chapter views and the position beacon only add to an in-memory WriteBuffer, so
+a reader paging through a story costs no writes per page; flush_progress()
+turns a batch of them into one lookup plus one bulk insert and one bulk update.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .buffers import WriteBuffer
+from .models import Chapter, ReadingProgress
+
+SHELF_SIZE = 6
+
+
+def _merge(old, new):
+    # a page view (position None) must not reset a position the beacon already reported
+    position, at = new
+    return (old[0] if position is None else position, at)
+
+
+def flush_progress(items):
+    """Write ``{(user_id, chapter_id): (position, at)}`` into ReadingProgress."""
+    stories = dict(Chapter.objects.filter(pk__in={chapter_id for _, chapter_id in items})
+                   .values_list('pk', 'story_id'))
+    # latest chapter per reader and story; chapters deleted meanwhile are dropped
+    latest = {}
+    for (user_id, chapter_id), (position, at) in items.items():
+        story_id = stories.get(chapter_id)
+        if story_id is None:
+            continue
+        current = latest.get((user_id, story_id))
+        if current is None or at > current[2]:
+            latest[(user_id, story_id)] = (chapter_id, position, at)
+    if not latest:
+        return
+
+    pairs = Q()
+    for user_id, story_id in latest:
+        pairs |= Q(user_id=user_id, story_id=story_id)
+    with transaction.atomic():
+        existing = {(row.user_id, row.story_id): row for row in ReadingProgress.objects.filter(pairs)}
+        created, updated = [], []
+        for (user_id, story_id), (chapter_id, position, at) in latest.items():
+            row = existing.get((user_id, story_id))
+            if row is None:
+                created.append(ReadingProgress(user_id=user_id, story_id=story_id, chapter_id=chapter_id,
+                                               position=position or 0, updated_at=at))
+            elif at > row.updated_at:  # another process may have flushed something newer
+                if position is None:
+                    position = row.position if row.chapter_id == chapter_id else 0
+                row.chapter_id, row.position, row.updated_at = chapter_id, position, at
+                updated.append(row)
+        # a concurrent flush may have created the row first; its write is as recent as ours
+        ReadingProgress.objects.bulk_create(created, ignore_conflicts=True)
+        ReadingProgress.objects.bulk_update(updated, ['chapter', 'position', 'updated_at'])
+
+
+progress_buffer = WriteBuffer(flush_progress, merge=_merge)
+
+
+def record_progress(user_id, chapter_id, position=None):
+    """Buffer a reader's visit to (or ``position`` percent into) a chapter."""
+    if position is not None:
+        position = max(0, min(int(position), 100))
+    progress_buffer.add((user_id, chapter_id), (position, timezone.now()))
+
+
+def records_progress(view_func):
+    """
+    Note each chapter a signed-in reader loads, including pages answered from
+    the page cache or with 304 Not Modified, so it goes outside those
+    decorators. The view must take the chapter as ``pk``.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        response = await view_func(request, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            user = await request.auser()
+            if user.is_authenticated:
+                record_progress(user.pk, kwargs['pk'])
+                if progress_buffer.due():
+                    await sync_to_async(progress_buffer.flush)()
+        return response
+    return wrapper
+
+
+def flush_reader(user_id):
+    """Flush the buffer if it holds anything of this reader's, so reads see what they just read."""
+    if any(pending_user == user_id for pending_user, _ in progress_buffer.pending()):
+        progress_buffer.flush()
+
+
+def continue_reading(user, limit=SHELF_SIZE):
+    """A reader's most recently read stories, newest first: one indexed query."""
+    flush_reader(user.pk)
+    return list(ReadingProgress.objects.filter(user=user).select_related('story', 'chapter')
+                .order_by('-updated_at')[:limit])
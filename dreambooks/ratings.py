@@ -0,0 +1,56 @@
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import Review, Story
+
+# Story.rating_score is a Bayesian average: every story starts with PRIOR_WEIGHT
+# imaginary reviews of PRIOR_MEAN stars, so a lone 5-star review cannot outrank
+# hundreds of 4.8s. A fixed prior (not the site-wide mean) keeps the score a
+# function of the story's own aggregates, so it updates in the same UPDATE.
+PRIOR_MEAN = 3.0
+PRIOR_WEIGHT = 5
+
+
+def _score(rating_sum, rating_count):
+    return (Value(PRIOR_WEIGHT * PRIOR_MEAN) + Cast(rating_sum, FloatField())) / \
+        (Value(float(PRIOR_WEIGHT)) + Cast(rating_count, FloatField()))
+
+
+def apply_rating_delta(story_id, rating_delta, count_delta):
+    """Atomically shift a story's stored rating aggregates by the given deltas (and mark it modified)."""
+    new_sum = F('rating_sum') + rating_delta
+    new_count = F('rating_count') + count_delta
+    # conditions see the row before the update, so "still has reviews" is count > -count_delta
+    has_reviews = Q(rating_count__gt=-count_delta)
+    Story.objects.filter(pk=story_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        avg_rating=Case(
+            When(has_reviews, then=Cast(new_sum, FloatField()) / Cast(new_count, FloatField())),
+            default=None,
+            output_field=FloatField(),
+        ),
+        # unrated stories score 0, below every rated one (ratings start at 1)
+        rating_score=Case(
+            When(has_reviews, then=_score(new_sum, new_count)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        modified_at=timezone.now(),
+    )
+
+
+def rebuild_ratings(queryset=None):
+    """Recompute the stored aggregates from the Review table in a single UPDATE."""
+    if queryset is None:
+        queryset = Story.objects.all()
+    reviews = Review.objects.filter(story=OuterRef('pk')).order_by().values('story')
+    rating_sum = Subquery(reviews.annotate(s=Sum('rating')).values('s'))
+    rating_count = Subquery(reviews.annotate(c=Count('pk')).values('c'))
+    queryset.update(
+        rating_sum=Coalesce(rating_sum, Value(0)),
+        rating_count=Coalesce(rating_count, Value(0)),
+        avg_rating=Cast(rating_sum, FloatField()) / Cast(rating_count, FloatField()),
+        rating_score=Coalesce(_score(rating_sum, rating_count), Value(0.0)),
+    )
@@ -0,0 +1,53 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.html import linebreaks
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+
+def _render_linebreaks(text):
+    # same output as {{ content|linebreaks }} with autoescaping on
+    return linebreaks(text, autoescape=True)
+
+
+def _render_markdown(text):
+    if markdown is None:
+        raise ImproperlyConfigured("DREAMBOOKS_CHAPTER_RENDERER='markdown' requires the 'markdown' package")
+    md = markdown.Markdown(extensions=['sane_lists', 'smarty'])
+    # writers' raw HTML is escaped, never passed through (this also keeps page-cache holes unforgeable)
+    md.preprocessors.deregister('html_block')
+    md.inlinePatterns.deregister('html')
+    return md.convert(text)
+
+
+# name -> (version, function). Bump a version whenever its output changes;
+# `manage.py render_chapters` then re-renders every chapter stored with the old one.
+RENDERERS = {
+    'linebreaks': (1, _render_linebreaks),
+    'markdown': (1, _render_markdown),
+}
+
+
+def current_renderer():
+    """The ``name:version`` tag new chapter HTML is rendered with."""
+    name = getattr(settings, 'DREAMBOOKS_CHAPTER_RENDERER', 'linebreaks')
+    if name not in RENDERERS:
+        raise ImproperlyConfigured(
+            f"DREAMBOOKS_CHAPTER_RENDERER={name!r}; choose from {', '.join(sorted(RENDERERS))}"
+        )
+    return f'{name}:{RENDERERS[name][0]}'
+
+
+def render_chapter(text, renderer=None):
+    """Render chapter text to HTML with ``renderer`` (a ``name:version`` tag, default current)."""
+    name = (renderer or current_renderer()).split(':', 1)[0]
+    return RENDERERS[name][1](text)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
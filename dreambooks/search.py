@@ -0,0 +1,197 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'dreambooks.search.SQLiteFTS5Backend'
+FTS_TABLE = 'dreambooks_search'
+
+# private-use markers swapped for <mark> after the snippet is HTML-escaped
+_HIT_START = '\ue000'
+_HIT_END = '\ue001'
+
+
+@dataclass
+class SearchHit:
+    story_id: int
+    rank: float
+    snippet: str = ''
+
+
+class BaseSearchBackend:
+    """Interface every search engine plugged into dreambooks implements."""
+
+    def index_story(self, story):
+        raise NotImplementedError
+
+    def remove_story(self, story_id):
+        raise NotImplementedError
+
+    def index_chapter(self, chapter):
+        raise NotImplementedError
+
+    def remove_chapter(self, chapter_id):
+        raise NotImplementedError
+
+    def search(self, query, limit=100):
+        """Return SearchHits for the best ``limit`` stories, most relevant first."""
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Re-index every story and chapter; returns the number of stories indexed."""
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Fallback for databases without FTS: plain icontains on story fields."""
+
+    def index_story(self, story):
+        pass
+
+    def remove_story(self, story_id):
+        pass
+
+    def index_chapter(self, chapter):
+        pass
+
+    def remove_chapter(self, chapter_id):
+        pass
+
+    def search(self, query, limit=100):
+        from django.db.models import Q
+        from .models import Story
+
+        ids = Story.objects.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        ).order_by('-created_at').values_list('id', flat=True)[:limit]
+        return [SearchHit(story_id=story_id, rank=position) for position, story_id in enumerate(ids)]
+
+    def rebuild(self):
+        return 0
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    One FTS5 table holds a row per story (title + description) and a row per
+    chapter (title + content). Rowids are 2*story_id and 2*chapter_id+1 so
+    every sync is a rowid lookup; search groups chapter hits by story and
+    keeps the best BM25 score.
+    """
+
+    title_weight = 10.0
+    body_weight = 1.0
+    snippet_tokens = 16
+    # matching rows (stories + chapters) ranked before grouping; bounds work on huge result sets
+    candidate_factor = 20
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _upsert(self, rowid, story_id, title, body):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid])
+        self._execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, story_id, title, body) VALUES (%s, %s, %s, %s)',
+            [rowid, story_id, title, body],
+        )
+
+    def index_story(self, story):
+        self._upsert(story.pk * 2, story.pk, story.title, story.description)
+
+    def remove_story(self, story_id):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [story_id * 2])
+
+    def index_chapter(self, chapter):
+        self._upsert(chapter.pk * 2 + 1, chapter.story_id, chapter.title, chapter.content)
+
+    def remove_chapter(self, chapter_id):
+        self._execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [chapter_id * 2 + 1])
+
+    @staticmethod
+    def to_match_expression(query):
+        """Quote every word so user input can't inject FTS5 syntax; last word is a prefix."""
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        terms = ['"%s"' % word for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query, limit=100):
+        expression = self.to_match_expression(query)
+        if expression is None:
+            return []
+        # the inner LIMIT keeps SQLite from flattening bm25() into the aggregate;
+        # with min(), SQLite takes the bare snip column from the best-ranked row
+        rows = self._execute(
+            f"""
+            SELECT story_id, min(score) AS best, snip
+            FROM (
+                SELECT story_id,
+                       bm25({FTS_TABLE}, 0.0, %s, %s) AS score,
+                       snippet({FTS_TABLE}, -1, %s, %s, '…', %s) AS snip
+                FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY score
+                LIMIT %s
+            )
+            GROUP BY story_id
+            ORDER BY best, story_id
+            LIMIT %s
+            """,
+            [self.title_weight, self.body_weight, _HIT_START, _HIT_END,
+             self.snippet_tokens, expression, limit * self.candidate_factor, limit],
+        )
+        return [
+            SearchHit(story_id=story_id, rank=score, snippet=highlight(snippet))
+            for story_id, score, snippet in rows
+        ]
+
+    def rebuild(self):
+        from .compression import decompress_text
+        from .models import ChapterBody, Story
+
+        insert = f'INSERT INTO {FTS_TABLE} (rowid, story_id, title, body) VALUES (%s, %s, %s, %s)'
+        stories = Story.objects.values_list('id', 'title', 'description')
+        chapters = ChapterBody.objects.values_list('chapter_id', 'chapter__story_id', 'chapter__title',
+                                                   'codec', 'data')
+        count = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for batch in _batched(stories.iterator(), 1000):
+                cursor.executemany(insert, [(pk * 2, pk, title, body) for pk, title, body in batch])
+                count += len(batch)
+            for batch in _batched(chapters.iterator(), 1000):
+                cursor.executemany(insert, [(pk * 2 + 1, story_id, title, decompress_text(codec, data))
+                                            for pk, story_id, title, codec, data in batch])
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        return count
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def highlight(snippet):
+    """HTML-escape a raw snippet and turn the hit markers into <mark> tags."""
+    return escape(snippet or '').replace(_HIT_START, '<mark>').replace(_HIT_END, '</mark>')
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'DREAMBOOKS_SEARCH_BACKEND', DEFAULT_BACKEND)
+    if path == DEFAULT_BACKEND and connection.vendor != 'sqlite':
+        path = 'dreambooks.search.DatabaseSearchBackend'
+    return import_string(path)()
@@ -0,0 +1,139 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import tasks
+from .cards import bump_card_versions
+from .jobs import enqueue
+from .models import Chapter, CoverBlob, Genre, Review, Story
+from .ratings import apply_rating_delta
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    # stash the stored rating so post_save can apply only the difference
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        apply_rating_delta(instance.story_id, instance.rating, 1)
+    elif previous != instance.rating:
+        apply_rating_delta(instance.story_id, instance.rating - previous, 0)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    apply_rating_delta(instance.story_id, -instance.rating, -1)
+
+
+@receiver(post_save, sender=Story)
+def story_saved(sender, instance, **kwargs):
+    enqueue(tasks.index_story, instance.pk)
+
+
+@receiver(post_delete, sender=Story)
+def story_deleted(sender, instance, **kwargs):
+    enqueue(tasks.remove_story, instance.pk)
+    enqueue(tasks.remove_story_exports, instance.pk)
+
+
+@receiver(post_save, sender=Chapter)
+def chapter_saved(sender, instance, **kwargs):
+    enqueue(tasks.index_chapter, instance.pk)
+
+
+@receiver(post_delete, sender=Chapter)
+def chapter_deleted(sender, instance, **kwargs):
+    enqueue(tasks.remove_chapter, instance.pk)
+
+
+@receiver(post_save, sender=Story)
+@receiver(post_delete, sender=Story)
+def story_card_changed(sender, instance, **kwargs):
+    bump_card_versions([instance.pk])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_card_changed(sender, instance, **kwargs):
+    # a comment-only edit moves no aggregate, but the story page and reviews feed still change
+    stories_changed([instance.story_id])
+
+
+def stories_changed(story_ids):
+    """Invalidate cached cards and HTTP validators of stories whose related data changed."""
+    story_ids = list(story_ids)
+    if story_ids:
+        bump_card_versions(story_ids)
+        Story.objects.filter(pk__in=story_ids).touch()
+
+
+@receiver(m2m_changed, sender=Story.genres.through)
+def story_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear', 'pre_clear'):
+        return
+    if not reverse:
+        stories_changed([instance.pk])
+    elif action == 'pre_clear':
+        # pk_set is empty on clear, so collect the affected stories first
+        stories_changed(instance.stories.values_list('pk', flat=True))
+    else:
+        stories_changed(pk_set or ())
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def genre_card_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        stories_changed(instance.stories.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=User)
+def author_card_changed(sender, instance, created, update_fields=None, **kwargs):
+    # cards and reviews only show the username; skip e.g. the last_login save on every login
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    stories_changed(Story.objects.filter(Q(author=instance) | Q(reviews__author=instance))
+                    .values_list('pk', flat=True).distinct())
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def chapter_index_changed(sender, instance, **kwargs):
+    # also retires the story's cached chapter index, which is keyed on modified_at
+    Story.objects.filter(pk=instance.story_id).touch()
+
+
+@receiver(pre_save, sender=Story)
+def remember_previous_cover(sender, instance, **kwargs):
+    instance._previous_cover = None
+    if instance.pk:
+        instance._previous_cover = (
+            Story.objects.filter(pk=instance.pk).values_list('cover_image', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Story)
+def story_cover_changed(sender, instance, created, **kwargs):
+    cover = instance.cover_image.name if instance.cover_image else None
+    previous = getattr(instance, '_previous_cover', None) or None
+    if cover == previous:
+        return
+    CoverBlob.adjust(cover, 1)
+    CoverBlob.adjust(previous, -1)
+    if cover or instance.cover_variants:
+        enqueue(tasks.build_story_cover_variants, instance.pk)
+
+
+@receiver(post_delete, sender=Story)
+def story_cover_released(sender, instance, **kwargs):
+    if instance.cover_image:
+        CoverBlob.adjust(instance.cover_image.name, -1)
@@ -0,0 +1,29 @@
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_NAME = re.compile(r'^[a-z_]+$')
+_VALUE = re.compile(r'^-?\w+$')
+
+
+def pragma_statements(pragmas):
+    """``PRAGMA name = value`` statements for a {name: value} mapping of trusted settings."""
+    statements = []
+    for name, value in pragmas.items():
+        if not _NAME.match(name) or not _VALUE.match(str(value)):
+            raise ValueError(f"Unsupported SQLite pragma {name}={value!r}")
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Run DREAMBOOKS_SQLITE_PRAGMAS on every new SQLite connection; most pragmas are per connection."""
+    pragmas = getattr(settings, 'DREAMBOOKS_SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
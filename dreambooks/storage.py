@@ -0,0 +1,45 @@
+import hashlib
+import posixpath
+from functools import cached_property
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every distinct file once, named by its SHA-256 and sharded by hash
+    prefix: ``<prefix>/ab/cd/abcd….png``. Uploading bytes that are already
+    stored returns the existing name instead of writing a renamed copy.
+    """
+
+    def __init__(self, prefix='covers', **kwargs):
+        self.prefix = prefix
+        # identical names always hold identical bytes, so overwriting is harmless
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        ext = posixpath.splitext(name)[1].lower()
+        return posixpath.join(self.prefix, hexdigest[:2], hexdigest[2:4], hexdigest + ext)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    @cached_property
+    def variant_storage(self):
+        """Plain storage over the same directory, for derived files with deterministic names."""
+        return FileSystemStorage(location=self.base_location, base_url=self.base_url)
+
+
+def cover_storage():
+    return ContentAddressedStorage(prefix='covers')
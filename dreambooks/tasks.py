@@ -0,0 +1,57 @@
+from django.core.mail import EmailMultiAlternatives
+
+from . import analytics
+from .exports import remove_exports
+from .images import generate_cover_variants
+from .jobs import job
+from .models import Chapter, Story
+from .search import get_backend
+
+
+@job
+def build_story_cover_variants(story_id):
+    story = Story.objects.filter(pk=story_id).first()
+    if story is not None:
+        generate_cover_variants(story)
+
+
+@job
+def index_story(story_id):
+    story = Story.objects.filter(pk=story_id).first()
+    if story is not None:
+        get_backend().index_story(story)
+
+
+@job
+def remove_story(story_id):
+    get_backend().remove_story(story_id)
+
+
+@job
+def remove_story_exports(story_id):
+    remove_exports(story_id)
+
+
+@job
+def index_chapter(chapter_id):
+    chapter = Chapter.objects.filter(pk=chapter_id).first()
+    if chapter is not None:
+        get_backend().index_chapter(chapter)
+
+
+@job
+def remove_chapter(chapter_id):
+    get_backend().remove_chapter(chapter_id)
+
+
+@job
+def send_email(subject, body, from_email, to, html_body=None):
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_body is not None:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
+
+
+@job
+def refresh_trending():
+    analytics.refresh_trending()
@@ -0,0 +1,11 @@
+from django import template
+
+from dreambooks.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def story_cards(context, stories, template_name):
+    """Usage: {% story_cards stories "dreambooks/story_card.html" as cards %}"""
+    return render_cards(stories, template_name, request=context.get('request'))
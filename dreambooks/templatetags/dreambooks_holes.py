@@ -0,0 +1,22 @@
+from django import template
+
+from dreambooks.pagecache import hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **params):
+    """
+    Usage: {% hole "dreambooks/holes/review_actions.html" review_id=review.id author_id=review.author_id %}
+
+    Renders the per-user fragment inline, or leaves a placeholder when the page
+    is being rendered for dreambooks.pagecache. Fragments see only ``params``
+    plus the current user, so ``params`` must be JSON-serialisable.
+    """
+    request = context.get('request')
+    if getattr(request, 'page_cache_holes', False):
+        return hole_marker(template_name, params)
+    # the same names context processors supply when the hole is filled later
+    values = {name: context.get(name) for name in ('request', 'user', 'csrf_token')}
+    return context.template.engine.get_template(template_name).render(context.new({**values, **params}))
@@ -0,0 +1,37 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from dreambooks.images import COVER_VARIANTS
+
+register = template.Library()
+
+
+@register.simple_tag
+def cover_image(story, variant, **attrs):
+    """
+    Responsive cover markup.
+    Usage: {% cover_image story "card" class="card-cover" alt=story.title %}
+    Falls back to the original upload until variants have been generated.
+    """
+    if not story.cover_image:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    renditions = (story.cover_variants or {}).get(variant)
+    if not renditions:
+        return format_html('<img src="{}"{}>', story.cover_image.url, flatatt(attrs))
+
+    storage = story.cover_image.storage
+    sizes = COVER_VARIANTS[variant]['sizes']
+
+    def srcset(items):
+        return ', '.join(f'{storage.url(name)} {width}w' for width, name in items)
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        srcset(renditions['webp']), sizes,
+        storage.url(renditions['fallback'][0][1]), srcset(renditions['fallback']), sizes,
+        flatatt(attrs),
+    )
@@ -0,0 +1,14 @@
+from django import template
+
+from dreambooks.progress import continue_reading
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def continue_reading_shelf(context):
+    """Usage: {% continue_reading_shelf as shelf %}; empty for anonymous readers."""
+    user = context.get('user')
+    if user is None or not user.is_authenticated:
+        return []
+    return continue_reading(user)
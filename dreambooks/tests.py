@@ -1,3 +1,1021 @@
-from django.test import TestCase
+import base64
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection, connections, reset_queries
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.html import linebreaks
+from django.utils import timezone
+from PIL import Image
+
+from . import jobs
+from .analytics import refresh_trending, rollup_views, view_buffer
+from .benchmarks import VIEW_BUDGETS, explain_views, measure
+from .cards import _version_key, get_card_cache, render_cards
+from .models import (
+    Chapter, ChapterBody, CoverBlob, Genre, Job, ReadingProgress, Review, Story, StoryViewBucket, TrendingState,
+)
+from .pagination import CursorPaginator
+from .progress import progress_buffer
+from .search import FTS_TABLE, SQLiteFTS5Backend, get_backend as get_search_backend
+from .sqlite import pragma_statements
+
+
+class QueryBudgetTestCase(TestCase):
+    """Counts the queries of a cold-cache GET; budgets live in benchmarks.VIEW_BUDGETS."""
+
+    def setUp(self):
+        cache.clear()
+        get_card_cache().clear()
+        # a flush falling due mid-request would be counted against the view
+        view_buffer.clear()
+        progress_buffer.clear()
+        self.genres = [Genre.objects.create(name=f"Genre {i}") for i in range(5)]
+
+    def make_stories(self, count):
+        start = Story.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create(username=f"author{i}")
+            story = Story.objects.create(title=f"Story {i}", author=author, description="A story.")
+            story.genres.set(self.genres[:(i % 5) + 1])
+
+    def count_queries(self, url):
+        cache.clear()
+        get_card_cache().clear()
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+
+class ListingQueryBudgetTests(QueryBudgetTestCase):
+    """Listings must cost a fixed number of queries no matter how many cards they show."""
+
+    def test_home_query_budget_is_independent_of_page_size(self):
+        self.make_stories(2)
+        Story.objects.update(trending_score=1)  # every section shows cards
+        few = self.count_queries(reverse('home'))
+        self.make_stories(10)
+        Story.objects.update(trending_score=1)
+        many = self.count_queries(reverse('home'))
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, VIEW_BUDGETS['home'])
+
+    def test_story_list_query_budget_is_independent_of_page_size(self):
+        self.make_stories(25)
+        small = self.count_queries(reverse('story_list') + '?per_page=2')
+        large = self.count_queries(reverse('story_list') + '?per_page=20')
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, VIEW_BUDGETS['story_list'])
+
+    def test_story_list_fragment_is_a_plain_response(self):
+        self.make_stories(3)
+        response = self.client.get(reverse('story_list_more') + '?per_page=2')
+        self.assertFalse(response.streaming)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertContains(response, "Story 2")
+        self.assertIn('page=', response['X-Next-Page'])
+
+
+class CardCacheTests(QueryBudgetTestCase):
+    def test_evicted_version_stamp_does_not_revive_old_fragments(self):
+        self.make_stories(1)
+        story = Story.objects.get()
+        first = render_cards([story], 'dreambooks/story_card.html')[0]
+        Story.objects.filter(pk=story.pk).update(title="Renamed")
+        story.refresh_from_db()
+        get_card_cache().delete(_version_key(story.pk))  # evicted, while the old fragment stays
+        second = render_cards([story], 'dreambooks/story_card.html')[0]
+        self.assertNotEqual(first, second)
+        self.assertIn("Renamed", second)
+
+    def test_staff_read_this_process_counters(self):
+        self.make_stories(2)
+        self.client.get(reverse('home'))
+        User.objects.create_user(username="reader", password="pw")
+        self.client.login(username="reader", password="pw")
+        self.assertEqual(self.client.get(reverse('card_stats')).status_code, 302)
+
+        User.objects.create_user(username="admin", password="pw", is_staff=True)
+        self.client.login(username="admin", password="pw")
+        stats = self.client.get(reverse('card_stats')).json()
+        self.assertGreater(stats['hits'] + stats['misses'], 0)
+        self.assertEqual(self.client.post(reverse('card_stats')).json()['misses'], 0)
+
+
+class QueryPlanTests(QueryBudgetTestCase):
+    """Every ordering the read views page through is served by an index, not a scan and sort."""
+
+    def test_read_views_do_not_scan_or_sort_stories(self):
+        self.make_stories(6)
+        story = Story.objects.first()
+        Chapter.objects.create(story=story, title="One", content="Text.", order=1)
+        report = explain_views()
+        for name, result in report['views'].items():
+            for query in result['queries']:
+                with self.subTest(view=name, sql=query['sql'][:80]):
+                    self.assertNotIn('dreambooks_story', query['full_scans'])
+                    if name != 'story_list_genre':  # sorts the genre's stories after the join
+                        self.assertFalse(query['temp_sort'], query['plan'])
+
+
+class ReadViewQueryBudgetTests(QueryBudgetTestCase):
+    """story_detail, chapter_detail and profile stay within VIEW_BUDGETS as content grows."""
+
+    def make_story_with_reviews(self, reviews, chapters=3):
+        story = Story.objects.create(title="Busy", author=User.objects.create(username="writer"),
+                                     description="A story.")
+        story.genres.set(self.genres)
+        for i in range(1, chapters + 1):
+            Chapter.objects.create(story=story, title=f"Chapter {i}", content="Text.", order=i)
+        for i in range(reviews):
+            reader = User.objects.create(username=f"reader{i}")
+            Review.objects.create(story=story, author=reader, rating=(i % 5) + 1, comment="Nice.")
+            Review.objects.create(story=Story.objects.create(title=f"Other {i}", author=story.author,
+                                                             description="More."),
+                                  author=reader, rating=3, comment="Ok.")
+        return story
+
+    def assert_within_budget(self, view, url):
+        self.assertLessEqual(self.count_queries(url), VIEW_BUDGETS[view])
+
+    def test_read_views_stay_within_budget(self):
+        story = self.make_story_with_reviews(reviews=8)
+        chapter = story.chapters.get(order=2)
+        self.assert_within_budget('story_detail', reverse('story_detail', args=[story.slug]))
+        self.assert_within_budget('chapter_detail', reverse('chapter_detail', args=[story.slug, chapter.pk]))
+        self.assert_within_budget('profile', reverse('profile', args=['writer']))
+        self.assert_within_budget('profile', reverse('profile', args=['reader3']))
+
+    def test_benchmark_reports_the_cold_request(self):
+        story = self.make_story_with_reviews(reviews=2)
+        url = reverse('story_detail', args=[story.slug])
+        cold = self.count_queries(url)
+        self.assertGreater(cold, 1)
+        self.assertEqual(measure(self.client, url, iterations=2)['queries'], cold)
+
+    def test_warm_chapter_read_is_only_the_validator(self):
+        story = self.make_story_with_reviews(reviews=0, chapters=4)
+        chapter = story.chapters.get(order=2)
+        url = reverse('chapter_detail', args=[story.slug, chapter.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.context['prev_chapter'].pk, story.chapters.get(order=1).pk)
+        self.assertEqual(response.context['next_chapter'].pk, story.chapters.get(order=3).pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).content, response.content)
+
+        # reordering through save() invalidates the cached navigation
+        last = story.chapters.get(order=4)
+        last.order = 0
+        last.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context['prev_chapter'].pk, story.chapters.get(order=1).pk)
+        first = self.client.get(reverse('chapter_detail', args=[story.slug, story.chapters.get(order=1).pk]))
+        self.assertEqual(first.context['prev_chapter'].pk, last.pk)
+
+        # a reorder made elsewhere only moves modified_at; nothing here deletes the cached index
+        Chapter.objects.filter(pk=last.pk).update(order=10)
+        Story.objects.filter(pk=story.pk).touch()
+        response = self.client.get(url)
+        self.assertEqual(response.context['prev_chapter'].pk, story.chapters.get(order=1).pk)
+        first = self.client.get(reverse('chapter_detail', args=[story.slug, story.chapters.get(order=1).pk]))
+        self.assertIsNone(first.context['prev_chapter'])
+
+
+class CursorPaginatorTests(TestCase):
+    ORDERING = ('-avg_rating', '-created_at', '-id')
+
+    def setUp(self):
+        author = User.objects.create(username="writer")
+        same_time = timezone.now() - timedelta(days=1)
+        # ties on every key but id, and NULL ratings, which sort last when descending
+        for i, rating in enumerate([None, 4.0, 4.0, None, 2.0, 4.0, None, 5.0]):
+            story = Story.objects.create(title=f"Story {i}", author=author, description="A story.")
+            Story.objects.filter(pk=story.pk).update(
+                avg_rating=rating, created_at=same_time if i % 2 else same_time - timedelta(hours=i))
+        self.expected = list(Story.objects.order_by(
+            F('avg_rating').desc(nulls_last=True), '-created_at', '-id').values_list('pk', flat=True))
+
+    def paginator(self, per_page=3):
+        return CursorPaginator(Story.objects.all(), self.ORDERING, per_page)
+
+    def test_forward_then_backward_visits_every_row_once(self):
+        paginator = self.paginator()
+        pages, page = [], paginator.page()
+        while True:
+            pages.append([story.pk for story in page])
+            if not page.has_next:
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual([pk for ids in pages for pk in ids], self.expected)
+        self.assertEqual(len(pages), 3)
+
+        backwards = []
+        while page.has_previous:
+            page = paginator.page(page.previous_cursor)
+            backwards.insert(0, [story.pk for story in page])
+        self.assertEqual(backwards, pages[:-1])
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+
+    def test_tampered_cursors_fall_back_to_the_first_page(self):
+        paginator = self.paginator()
+        first = [story.pk for story in paginator.page()]
+        bad_key = base64.urlsafe_b64encode(b'{"k":["x","not a date",1],"r":0}').decode()
+        wrong_length = base64.urlsafe_b64encode(b'{"k":[1],"r":0}').decode()
+        for token in ('not-base64!', 'e30', bad_key, wrong_length, base64.urlsafe_b64encode(b'[]').decode()):
+            with self.subTest(token=token):
+                self.assertIsNone(paginator.decode_cursor(token))
+                self.assertEqual([story.pk for story in paginator.page(token)], first)
+
+    def test_cursor_on_a_null_key_continues_after_it(self):
+        paginator = self.paginator(per_page=6)
+        page = paginator.page()
+        self.assertIsNone(page.object_list[-1].avg_rating)
+        rest = paginator.page(page.next_cursor)
+        self.assertEqual([story.pk for story in rest], self.expected[6:])
+        self.assertFalse(rest.has_next)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="writer")
+        self.backend = get_search_backend()
+
+    def create_story(self, title, description, chapter=None):
+        # the index is kept by jobs, which run eagerly once the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            story = Story.objects.create(title=title, author=self.author, description=description)
+            if chapter:
+                Chapter.objects.create(story=story, title="One", content=chapter, order=1)
+        return story
+
+    def found(self, query):
+        return [hit.story_id for hit in self.backend.search(query)]
+
+    def test_signals_keep_the_index_in_sync(self):
+        story = self.create_story("Sea Tales", "Stories of the sea.", chapter="A lighthouse keeper waits.")
+        self.assertEqual(self.found("lighthouse"), [story.pk])
+        chapter = story.chapters.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.content = "A fisherman waits."
+            chapter.save()
+        self.assertEqual(self.found("lighthouse"), [])
+        self.assertEqual(self.found("fisher"), [story.pk])  # the last word matches as a prefix
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.delete()
+        self.assertEqual(self.found("fisherman"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            story.delete()
+        self.assertEqual(self.found("sea"), [])
+
+    def test_title_matches_rank_above_body_matches(self):
+        body = self.create_story("Plain", "Somewhere a dragon sleeps among many other words here.")
+        title = self.create_story("Dragon", "A quiet story.")
+        chapter = self.create_story("Other", "Nothing.", chapter="The dragon woke.")
+        self.assertEqual(self.found("dragon")[0], title.pk)
+        self.assertEqual(set(self.found("dragon")), {body.pk, title.pk, chapter.pk})
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        self.create_story("Markup", "Beware <script>alert(1)</script> of the dragon & co.")
+        snippet = self.backend.search("dragon")[0].snippet
+        self.assertIn("<mark>dragon</mark>", snippet)
+        self.assertIn("&lt;script&gt;", snippet)
+        self.assertNotIn("<script>", snippet)
+        response = self.client.get(reverse('story_list'), {'q': 'dragon'})
+        self.assertContains(response, "<mark>dragon</mark>", html=False)
+
+    def test_fts_operators_in_queries_are_quoted(self):
+        story = self.create_story("Near Or Not", "Words AND more words.")
+        self.assertEqual(SQLiteFTS5Backend.to_match_expression('near" OR (not*'), '"near" "OR" "not"*')
+        self.assertIsNone(SQLiteFTS5Backend.to_match_expression('"* - ^'))
+        for query in ('near" OR (not*', 'NEAR(words more)', 'AND', 'title:near', '"*'):
+            with self.subTest(query=query):
+                hits = self.found(query)
+                self.assertIn(hits, ([], [story.pk]))
+        self.assertEqual(self.found('AND'), [story.pk])
+
+    def test_rebuild_restores_a_lost_index(self):
+        stories = [self.create_story(f"Saga {i}", "An epic.", chapter=f"Chapter text {i}.") for i in range(3)]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertEqual(self.found("epic"), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn("Stories indexed: 3", out.getvalue())
+        self.assertEqual(set(self.found("epic")), {story.pk for story in stories})
+        self.assertEqual(self.found("text 2"), [stories[2].pk])
+
+
+class BulkSeedTests(TestCase):
+    def seed(self):
+        call_command('seed_stories', bulk=True, count=10, chapters=2, seed=7, batch_size=4, users=6,
+                     chapter_sentences=2, stdout=StringIO())
+
+    def snapshot(self):
+        stories = Story.objects.order_by('slug').prefetch_related('genres', 'chapters__body')
+        return [
+            (story.slug, story.title, story.description, story.author.username,
+             sorted(genre.name for genre in story.genres.all()),
+             [(chapter.order, chapter.content) for chapter in story.chapters.order_by('order')],
+             sorted(story.reviews.values_list('author__username', 'rating', 'comment')))
+            for story in stories.select_related('author')
+        ]
+
+    def test_same_seed_gives_the_same_consistent_data(self):
+        self.seed()
+        first = self.snapshot()
+        Story.objects.all().delete()
+        User.objects.filter(username__startswith='seed_7_').delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(len(first), 10)
+
+        slugs = list(Story.objects.values_list('slug', flat=True))
+        self.assertEqual(len(set(slugs)), len(slugs))
+        for story in Story.objects.all():
+            ratings = list(story.reviews.values_list('rating', flat=True))
+            with self.subTest(story=story.slug):
+                self.assertEqual((story.rating_sum, story.rating_count), (sum(ratings), len(ratings)))
+                self.assertEqual(story.avg_rating, sum(ratings) / len(ratings) if ratings else None)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], Story.objects.count() + Chapter.objects.count())
+        story = Story.objects.order_by('slug').first()
+        self.assertIn(story.pk, [hit.story_id for hit in get_search_backend().search(story.title)])
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="writer")
+
+    def create(self, title="Untitled"):
+        return Story.objects.create(title=title, author=self.author, description="A story.")
+
+    def queries_for_next_duplicate(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.create()
+        return len(ctx.captured_queries)
+
+    def test_duplicate_titles_get_increasing_suffixes(self):
+        slugs = [self.create().slug for _ in range(3)]
+        self.assertEqual(slugs, ["untitled", "untitled-1", "untitled-2"])
+
+    def test_cost_is_constant_as_duplicates_grow(self):
+        self.create()
+        self.create()
+        early = self.queries_for_next_duplicate()
+        for _ in range(30):
+            self.create()
+        self.assertEqual(self.queries_for_next_duplicate(), early)
+
+    def test_recovers_from_slugs_taken_behind_the_counter(self):
+        self.create()
+        # bulk_create bypasses save() and so never touches the counter
+        Story.objects.bulk_create([
+            Story(title="Untitled", author=self.author, description="A story.", slug=f"untitled-{i}")
+            for i in range(1, 4)
+        ])
+        self.assertEqual(self.create().slug, "untitled-4")
+
+
+@jobs.job
+def flaky_job(marker):
+    flaky_job.calls.append(marker)
+    if len(flaky_job.calls) == 1:
+        raise RuntimeError("first attempt fails")
+
+
+flaky_job.calls = []
+
+
+@override_settings(DREAMBOOKS_JOBS_EAGER=False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        flaky_job.calls = []
+
+    def test_failed_job_is_retried_after_backoff(self):
+        record = jobs.enqueue(flaky_job, 'x', max_attempts=2)
+        self.assertEqual(jobs.claim(5), [record.pk])
+        self.assertEqual(jobs.claim(5), [])  # claimed jobs are invisible to other workers
+        with self.assertLogs('dreambooks.jobs', 'WARNING'):
+            self.assertFalse(jobs.run_job(record.pk))
+        record.refresh_from_db()
+        self.assertEqual((record.status, record.attempts), (Job.QUEUED, 1))
+        self.assertIn("first attempt fails", record.last_error)
+
+        Job.objects.filter(pk=record.pk).update(run_after=timezone.now())
+        self.assertEqual(jobs.claim(5), [record.pk])
+        self.assertTrue(jobs.run_job(record.pk))
+        record.refresh_from_db()
+        self.assertEqual(record.status, Job.DONE)
+        self.assertEqual(flaky_job.calls, ['x', 'x'])
+
+    @override_settings(DREAMBOOKS_JOBS_EAGER=True)
+    def test_eager_mode_runs_on_commit_and_ignores_delay(self):
+        flaky_job.calls = ['failed before']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(jobs.enqueue(flaky_job, 'z', delay=3600))
+            self.assertEqual(flaky_job.calls, ['failed before'])
+        self.assertEqual(flaky_job.calls, ['failed before', 'z'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_expired_claim_becomes_visible_again(self):
+        record = jobs.enqueue(flaky_job, 'y')
+        jobs.claim(1, visibility_timeout=60)
+        Job.objects.filter(pk=record.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.claim(1), [record.pk])
+        record.refresh_from_db()
+        self.assertEqual(record.attempts, 2)
+
+    def test_long_finished_jobs_are_purged(self):
+        now = timezone.now()
+        done, failed, queued = (jobs.enqueue(flaky_job, name) for name in ('done', 'failed', 'queued'))
+        Job.objects.filter(pk=done.pk).update(status=Job.DONE, updated_at=now - timedelta(days=8))
+        Job.objects.filter(pk=failed.pk).update(status=Job.FAILED, updated_at=now - timedelta(days=8))
+        Job.objects.filter(pk=queued.pk).update(updated_at=now - timedelta(days=60))
+        self.assertEqual(jobs.purge(now), 1)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {failed.pk, queued.pk})
+
+    def test_out_of_process_jobs_need_shared_caches(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "cards, default caches are per-process"):
+            jobs.check_shared_caches()
+        shared = {alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+                  for alias in ('default', 'cards')}
+        with override_settings(CACHES=shared):
+            jobs.check_shared_caches()
+        with override_settings(DREAMBOOKS_JOBS_EAGER=True):
+            jobs.check_shared_caches()
+
+    def test_saving_a_story_queues_search_indexing(self):
+        story = Story.objects.create(title="Queued", author=User.objects.create(username="writer"),
+                                     description="A story.")
+        self.assertTrue(Job.objects.filter(name='dreambooks.tasks.index_story', args=[story.pk]).exists())
+
+
+class AsyncReadViewTests(TestCase):
+    """The read views are async; drive them through the ASGI handler."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = User.objects.create_user(username="writer", password="pw")
+        cls.story = Story.objects.create(title="Async", author=cls.writer, description="A story.")
+        cls.chapter = Chapter.objects.create(story=cls.story, title="One", content="Text.", order=1)
+
+    async def test_read_views_render_under_asgi(self):
+        urls = [
+            reverse('home'),
+            reverse('story_list') + '?order=oldest',
+            reverse('story_detail', args=[self.story.slug]),
+            reverse('chapter_detail', args=[self.story.slug, self.chapter.pk]),
+            reverse('profile', args=['writer']),
+        ]
+        for url in urls:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertContains(response, "Async")
+
+    async def test_review_is_posted_once(self):
+        await self.async_client.alogin(username="writer", password="pw")
+        url = reverse('story_detail', args=[self.story.slug])
+        response = await self.async_client.post(url, {'rating': 4, 'comment': "Good."})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        await self.async_client.post(url, {'rating': 2, 'comment': "Again."})
+        self.assertEqual(await self.story.reviews.acount(), 1)
+        await self.story.arefresh_from_db()
+        self.assertEqual(self.story.avg_rating, 4)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.writer = User.objects.create_user(username="writer", password="pw")
+        self.story = Story.objects.create(title="Cached", author=self.writer, description="A story.")
+        self.chapter = Chapter.objects.create(story=self.story, title="One", content="Text.", order=1)
+        self.url = reverse('chapter_detail', args=[self.story.slug, self.chapter.pk])
+
+    def test_unchanged_page_is_not_modified_after_one_query(self):
+        response = self.client.get(self.url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            again = self.client.get(self.url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        again = self.client.get(self.url, headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(again.status_code, 304)
+
+    def test_related_changes_produce_a_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.chapter.content = "Edited."
+        self.chapter.save()
+        response = self.client.get(self.url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        Review.objects.create(story=self.story, author=User.objects.create(username="reader"), rating=5)
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': etag}).status_code, 200)
+
+        home = self.client.get(reverse('home'))
+        self.story.delete()
+        self.assertEqual(self.client.get(reverse('home'), headers={'if-none-match': home['ETag']}).status_code, 200)
+
+    def test_comment_only_review_edit_produces_a_new_etag(self):
+        review = Review.objects.create(story=self.story, author=User.objects.create(username="reader"),
+                                       rating=4, comment="Fine.")
+        urls = [reverse('story_detail', args=[self.story.slug]),
+                reverse('api_review_list', args=[self.story.slug])]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        review.comment = "Grew on me."
+        review.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, headers={'if-none-match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, "Grew on me.")
+
+    def test_signed_in_pages_are_private_and_per_user(self):
+        anonymous_etag = self.client.get(self.url)['ETag']
+        self.client.login(username="writer", password="pw")
+        response = self.client.get(self.url, headers={'if-none-match': anonymous_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.writer = User.objects.create_user(username="writer", password="pw")
+        self.reader = User.objects.create_user(username="reader", password="pw")
+        self.story = Story.objects.create(title="Paged", author=self.writer, description="A story.")
+        self.chapter = Chapter.objects.create(story=self.story, title="One", content="Text.", order=1)
+        self.url = reverse('story_detail', args=[self.story.slug])
+
+    def test_signed_in_readers_get_their_own_holes_filled(self):
+        anonymous = self.client.get(self.url)
+        self.assertContains(anonymous, "to write a review")
+        self.assertNotContains(anonymous, "<!--hole:")
+
+        self.client.login(username="reader", password="pw")
+        with self.assertNumQueries(3):  # validator, session, user; the page itself is cached
+            response = self.client.get(self.url)
+        self.assertContains(response, "Submit Review")
+        self.assertContains(response, "reader")
+        self.assertNotContains(response, "Edit Story")
+
+        self.client.login(username="writer", password="pw")
+        self.assertContains(self.client.get(self.url), "Edit Story")
+
+    def test_review_invalidates_the_cached_page(self):
+        self.client.get(self.url)
+        review = Review.objects.create(story=self.story, author=self.reader, rating=5, comment="Loved the ending.")
+        self.assertContains(self.client.get(self.url), "Loved the ending.")
+
+        review.comment = "Loved the middle too."
+        review.save()
+        self.assertContains(self.client.get(self.url), "Loved the middle too.")
+
+    def test_renaming_a_reviewer_invalidates_the_cached_page(self):
+        Review.objects.create(story=self.story, author=self.reader, rating=5, comment="Loved the ending.")
+        self.assertContains(self.client.get(self.url), "reader")
+        self.reader.username = "night-reader"
+        self.reader.save()
+        self.assertContains(self.client.get(self.url), "night-reader")
+
+    def test_irrelevant_query_params_share_an_entry(self):
+        self.client.get(self.url + '?utm_source=feed')
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+
+class ChapterBodyTests(TestCase):
+    def setUp(self):
+        self.story = Story.objects.create(title="Long", author=User.objects.create(username="writer"),
+                                          description="A story.")
+
+    def test_long_bodies_are_compressed_and_round_trip(self):
+        text = "The dream went on and on. " * 200
+        chapter = Chapter.objects.create(story=self.story, title="One", content=text, order=1)
+        body = ChapterBody.objects.get(chapter=chapter)
+        self.assertEqual(body.codec, 'zlib')
+        self.assertLess(len(body.data), len(text) // 10)
+        self.assertEqual(Chapter.objects.select_related('body').get(pk=chapter.pk).content, text)
+
+    def test_chapter_lists_do_not_read_bodies(self):
+        Chapter.objects.create(story=self.story, title="One", content="Text.", order=1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('story_detail', args=[self.story.slug]))
+        self.assertFalse([q for q in ctx.captured_queries if 'dreambooks_chapterbody' in q['sql']])
+
+    def test_html_is_rendered_on_save_and_escaped(self):
+        text = "First <b>line</b>.\n\nSecond paragraph."
+        chapter = Chapter.objects.create(story=self.story, title="One", content=text, order=1)
+        body = ChapterBody.objects.get(chapter=chapter)
+        self.assertEqual(body.renderer, 'linebreaks:1')
+        self.assertEqual(body.html, linebreaks(text, autoescape=True))
+        self.assertContains(self.client.get(reverse('chapter_detail', args=[self.story.slug, chapter.pk])),
+                            "<p>First &lt;b&gt;line&lt;/b&gt;.</p>", html=False)
+
+    def test_stale_renderer_is_redone_by_render_chapters(self):
+        chapter = Chapter.objects.create(story=self.story, title="One", content="Text.", order=1)
+        ChapterBody.objects.filter(pk=chapter.pk).update(renderer='linebreaks:0', html_data=b'stale')
+        self.assertEqual(ChapterBody.objects.get(pk=chapter.pk).html, "<p>Text.</p>")
+        call_command('render_chapters', workers=1, stdout=StringIO())
+        body = ChapterBody.objects.get(pk=chapter.pk)
+        self.assertEqual((body.renderer, bytes(body.html_data)), ('linebreaks:1', b"<p>Text.</p>"))
+
+
+class SQLitePragmaTests(TestCase):
+    @override_settings(DREAMBOOKS_SQLITE_PRAGMAS={'cache_size': -1234, 'temp_store': 'memory'})
+    def test_pragmas_are_applied_to_new_connections(self):
+        conn = connections.create_connection('default')
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                self.assertEqual(cursor.fetchone()[0], -1234)
+                cursor.execute('PRAGMA temp_store')
+                self.assertEqual(cursor.fetchone()[0], 2)
+        finally:
+            conn.close()
+
+    def test_pragma_names_and_values_are_checked(self):
+        with self.assertRaises(ValueError):
+            pragma_statements({'cache_size': '1; DROP TABLE dreambooks_story'})
+
+
+class ApiTests(QueryBudgetTestCase):
+    def test_story_list_costs_the_same_for_any_page_size(self):
+        self.make_stories(3)
+        url = reverse('api_story_list')
+        few = self.count_queries(url + '?limit=2')
+        many = self.count_queries(url + '?limit=3')
+        self.assertEqual(few, many)
+        # validator, stories with authors, genres
+        self.assertEqual(many, 3)
+
+    def test_sparse_fields_skip_joins_and_prefetches(self):
+        self.make_stories(3)
+        url = reverse('api_story_list') + '?fields=title'
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(url).json()['data']
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn('auth_user', ctx.captured_queries[1]['sql'])
+        self.assertEqual(set(data[0]), {'id', 'title'})
+
+    def test_profile_counts_come_from_separate_subqueries(self):
+        self.make_stories(3)
+        writer = User.objects.create(username="prolific")
+        for i in range(2):
+            Story.objects.create(title=f"Mine {i}", author=writer, description="A story.")
+        for story in Story.objects.exclude(author=writer):
+            Review.objects.create(story=story, author=writer, rating=4)
+        url = reverse('api_profile', args=['prolific']) + '?fields=story_count,review_count'
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(url).json()['data']
+        self.assertEqual((data['story_count'], data['review_count']), (2, 3))
+        self.assertNotIn('JOIN', ctx.captured_queries[-1]['sql'])
+        self.assertEqual(self.client.get(reverse('api_profile', args=['author0'])).json()['data']['story_count'], 1)
+
+    def test_cursor_pages_cover_every_story_once(self):
+        self.make_stories(5)
+        url, seen = reverse('api_story_list') + '?limit=2&fields=id', []
+        while url:
+            body = self.client.get(url).json()
+            seen += [story['id'] for story in body['data']]
+            url = body['next']
+        self.assertEqual(sorted(seen), sorted(Story.objects.values_list('pk', flat=True)))
+
+    def test_batched_ids_keep_their_order_and_report_missing(self):
+        self.make_stories(3)
+        first, second, third = Story.objects.order_by('pk').values_list('pk', flat=True)
+        body = self.client.get(reverse('api_story_list') + f'?ids={third},999,{first}').json()
+        self.assertEqual([story['id'] for story in body['data']], [third, first])
+        self.assertEqual(body['missing'], [999])
+
+    def test_chapter_body_and_errors(self):
+        self.make_stories(1)
+        story = Story.objects.get()
+        chapter = Chapter.objects.create(story=story, title="One", content="Hello <there>.", order=1)
+        url = reverse('api_chapter_body', args=[story.slug, chapter.pk])
+        self.assertEqual(self.client.get(url).json()['data']['content'], "<p>Hello &lt;there&gt;.</p>")
+        self.assertEqual(self.client.get(url + '?format=text').json()['data']['content'], "Hello <there>.")
+        chapters = self.client.get(reverse('api_chapter_list', args=[story.slug])).json()['data']
+        self.assertEqual(chapters[0]['body_url'], url)
+
+        self.assertEqual(self.client.get(reverse('api_chapter_list', args=['nope'])).status_code, 404)
+        response = self.client.get(reverse('api_story_list') + '?fields=title,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()['error'])
+
+
+class CoverVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_backfill_retires_cached_cards_and_pages(self):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 600), 'navy').save(buffer, 'PNG')
+        story = Story(title="Covered", author=User.objects.create(username="writer"), description="A story.")
+        story.cover_image.save('cover.png', ContentFile(buffer.getvalue()), save=False)
+        story.save()
+        long_ago = timezone.now() - timedelta(days=1)
+        Story.objects.filter(pk=story.pk).update(cover_variants={}, modified_at=long_ago)
+        before = self.client.get(reverse('story_detail', args=[story.slug]))
+        self.assertNotContains(before, 'srcset')
+
+        call_command('generate_cover_variants', workers=1, stdout=StringIO())
+        story.refresh_from_db()
+        self.assertEqual(set(story.cover_variants), {'list', 'card', 'detail'})
+        self.assertGreater(story.modified_at, long_ago)
+        after = self.client.get(reverse('story_detail', args=[story.slug]),
+                                headers={'if-none-match': before['ETag']})
+        self.assertContains(after, 'srcset')
+
+
+class CoverCollectionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_grace_period_starts_when_the_last_reference_goes(self):
+        story = Story(title="Covered", author=User.objects.create(username="writer"), description="A story.")
+        story.cover_image.save('cover.png', ContentFile(b'not really a png'), save=False)
+        story.save()
+        name, storage = story.cover_image.name, story.cover_image.storage
+        CoverBlob.objects.filter(name=name).update(created_at=timezone.now() - timedelta(days=30))
+        story.delete()
+
+        call_command('gc_covers', min_age=60, stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+        CoverBlob.objects.filter(name=name).update(unreferenced_at=timezone.now() - timedelta(hours=2))
+        call_command('gc_covers', min_age=60, stdout=StringIO())
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(CoverBlob.objects.filter(name=name).exists())
+
+
+    def test_legacy_duplicates_are_merged_then_collected(self):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 60), 'teal').save(buffer, 'PNG')
+        plain = FileSystemStorage()
+        author = User.objects.create(username="writer")
+        stories = []
+        for filename in ('covers/first.png', 'covers/second.png'):
+            name = plain.save(filename, ContentFile(buffer.getvalue()))
+            story = Story.objects.create(title=filename, author=author, description="A story.")
+            # as stored before content addressing, with the counts migration 0011 made
+            Story.objects.filter(pk=story.pk).update(cover_image=name)
+            CoverBlob.objects.create(name=name, refcount=1)
+            stories.append((story, name))
+
+        call_command('rehash_covers', stdout=StringIO())
+        names = {Story.objects.get(pk=story.pk).cover_image.name for story, _ in stories}
+        self.assertEqual(len(names), 1)
+        merged = names.pop()
+        self.assertEqual(CoverBlob.objects.get(name=merged).refcount, 2)
+        self.assertTrue(all(Story.objects.get(pk=story.pk).cover_variants for story, _ in stories))
+
+        call_command('gc_covers', min_age=0, stdout=StringIO())
+        self.assertTrue(plain.exists(merged))
+        for _, old_name in stories:
+            self.assertFalse(plain.exists(old_name))
+
+
+class StoryExportTests(TestCase):
+    def setUp(self):
+        self.export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_root, ignore_errors=True)
+        self.enterContext(override_settings(DREAMBOOKS_EXPORT_ROOT=self.export_root))
+        self.story = Story.objects.create(title="Book", author=User.objects.create(username="writer"),
+                                          description="A long story.")
+        for order in (2, 1):
+            Chapter.objects.create(story=self.story, title=f"Part {order}", content=f"Text of part {order}.",
+                                   order=order)
+
+    def download(self, fmt):
+        response = self.client.get(reverse('story_export', args=[self.story.slug, fmt]))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_text_export_is_streamed_in_order_then_served_from_disk(self):
+        with self.assertNumQueries(3):  # last-modified, story, chapters with bodies
+            text = self.download('txt').decode()
+        self.assertLess(text.index("Text of part 1."), text.index("Text of part 2."))
+        with self.assertNumQueries(2):
+            self.assertEqual(self.download('txt').decode(), text)
+
+    async def test_export_is_streamed_asynchronously_under_asgi(self):
+        response = await self.async_client.get(reverse('story_export', args=[self.story.slug, 'txt']))
+        self.assertTrue(response.streaming)
+        self.assertTrue(response.is_async)
+        text = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertLess(text.index("Text of part 1."), text.index("Text of part 2."))
+        self.assertEqual(len(list(Path(self.export_root, str(self.story.pk)).glob('*.txt'))), 1)
+
+    def test_chapter_change_rebuilds_the_export(self):
+        self.download('txt')
+        chapter = self.story.chapters.get(order=1)
+        chapter.content = "Rewritten."
+        chapter.save()
+        self.assertIn("Rewritten.", self.download('txt').decode())
+        self.assertEqual(len(list(Path(self.export_root, str(self.story.pk)).glob('*.txt'))), 1)
+
+    def test_epub_is_a_valid_package(self):
+        book = zipfile.ZipFile(BytesIO(self.download('epub')))
+        first = book.infolist()[0]
+        self.assertEqual((first.filename, first.compress_type), ('mimetype', zipfile.ZIP_STORED))
+        self.assertIsNone(book.testzip())
+        opf = book.read('OEBPS/content.opf').decode()
+        part1, part2 = self.story.chapters.order_by('order')
+        self.assertLess(opf.index(f'idref="c{part1.pk}"'), opf.index(f'idref="c{part2.pk}"'))
+        self.assertIn("Text of part 2.", book.read(f'OEBPS/chapter-{part2.pk}.xhtml').decode())
+
+
+class ReadingProgressTests(TestCase):
+    def setUp(self):
+        progress_buffer.clear()
+        self.reader = User.objects.create_user(username="reader", password="pw")
+        self.story = Story.objects.create(title="Long", author=User.objects.create(username="writer"),
+                                          description="A story.")
+        self.chapters = [Chapter.objects.create(story=self.story, title=f"Part {i}", content="Text.", order=i)
+                         for i in (1, 2)]
+        self.client.login(username="reader", password="pw")
+
+    def read(self, chapter):
+        self.client.get(reverse('chapter_detail', args=[self.story.slug, chapter.pk]))
+
+    def test_page_views_are_coalesced_into_one_row(self):
+        for chapter in self.chapters + self.chapters:
+            self.read(chapter)
+        self.assertEqual(ReadingProgress.objects.count(), 0)
+        self.assertEqual(len(progress_buffer), 2)
+        with self.assertNumQueries(5):  # chapters, existing rows, savepoint, insert, release
+            progress_buffer.flush()
+        progress = ReadingProgress.objects.get()
+        self.assertEqual((progress.user, progress.chapter), (self.reader, self.chapters[1]))
+
+    def test_reload_keeps_the_reported_position(self):
+        url = reverse('chapter_progress', args=[self.story.slug, self.chapters[0].pk])
+        self.read(self.chapters[0])
+        self.assertEqual(self.client.post(url, {'position': 40}).status_code, 204)
+        progress_buffer.flush()
+        self.read(self.chapters[0])
+        progress_buffer.flush()
+        self.assertEqual(ReadingProgress.objects.get().position, 40)
+        self.read(self.chapters[1])
+        progress_buffer.flush()
+        self.assertEqual(ReadingProgress.objects.get().position, 0)
+
+    def test_home_shelf_shows_unflushed_progress(self):
+        self.read(self.chapters[1])
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, "Continue Reading")
+        self.assertContains(response, reverse('chapter_detail', args=[self.story.slug, self.chapters[1].pk]))
+        self.assertEqual(len(progress_buffer), 0)
+
+    def test_reading_changes_the_signed_in_home_etag(self):
+        first = self.client.get(reverse('home'))
+        self.assertNotContains(first, "Continue Reading")
+        again = self.client.get(reverse('home'), headers={'if-none-match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+        self.read(self.chapters[0])
+        after = self.client.get(reverse('home'), headers={'if-none-match': first['ETag']})
+        self.assertEqual(after.status_code, 200)
+        self.assertContains(after, "Continue Reading")
+
+    def test_beacon_for_another_story_is_rejected(self):
+        other = Story.objects.create(title="Other", author=self.story.author, description="A story.")
+        url = reverse('chapter_progress', args=[other.slug, self.chapters[0].pk])
+        self.assertEqual(self.client.post(url, {'position': 40}).status_code, 404)
+        self.assertEqual(len(progress_buffer), 0)
+
+
+class ViewAnalyticsTests(TestCase):
+    def setUp(self):
+        view_buffer.clear()
+        cache.clear()
+        author = User.objects.create(username="writer")
+        self.quiet, self.busy = [Story.objects.create(title=title, author=author, description="A story.")
+                                 for title in ("Quiet", "Busy")]
+        self.chapter = Chapter.objects.create(story=self.busy, title="One", content="Text.", order=1)
+
+    def test_views_are_buffered_and_flushed_in_one_batch(self):
+        for _ in range(3):
+            self.client.get(reverse('story_detail', args=[self.busy.slug]))
+            self.client.get(reverse('chapter_detail', args=[self.busy.slug, self.chapter.pk]))
+        self.client.get(reverse('story_detail', args=[self.quiet.slug]))
+        self.assertFalse(StoryViewBucket.objects.exists())
+        # slugs, chapters, savepoint, one upsert for every bucket, view_count, release, refresh schedule
+        with self.assertNumQueries(7):
+            view_buffer.flush()
+        bucket = StoryViewBucket.objects.get(story=self.busy)
+        self.assertEqual((bucket.period, bucket.story_views, bucket.chapter_views), (StoryViewBucket.HOUR, 3, 3))
+        self.busy.refresh_from_db()
+        self.assertEqual(self.busy.view_count, 6)
+
+        # a second batch for the same hour adds onto the bucket
+        self.client.get(reverse('story_detail', args=[self.busy.slug]))
+        view_buffer.flush()
+        self.assertEqual(StoryViewBucket.objects.get(story=self.busy).story_views, 4)
+
+    def test_old_hours_roll_up_and_recent_views_trend_higher(self):
+        now = timezone.now()
+        old = (now - timedelta(days=5)).replace(hour=3, minute=0, second=0, microsecond=0)
+        StoryViewBucket.objects.create(story=self.quiet, period=StoryViewBucket.HOUR, start=old, story_views=20)
+        StoryViewBucket.objects.create(story=self.quiet, period=StoryViewBucket.HOUR,
+                                       start=old + timedelta(hours=1), story_views=20)
+        StoryViewBucket.objects.create(story=self.busy, period=StoryViewBucket.HOUR,
+                                       start=now.replace(minute=0, second=0, microsecond=0), story_views=15)
+        self.assertEqual(refresh_trending(now), 2)
+
+        daily = StoryViewBucket.objects.get(story=self.quiet)
+        self.assertEqual((daily.period, daily.story_views), (StoryViewBucket.DAY, 40))
+        self.quiet.refresh_from_db()
+        self.busy.refresh_from_db()
+        self.assertGreater(self.busy.trending_score, self.quiet.trending_score)
+
+        trending = self.client.get(reverse('home')).context['trending_stories']
+        self.assertEqual(trending, [self.busy, self.quiet])
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_rollup_uses_utc_days_in_any_time_zone(self):
+        now = timezone.now()
+        # 03:00 and 05:00 UTC fall on two different New York days, with or without DST
+        old = (now - timedelta(days=5)).replace(hour=3, minute=0, second=0, microsecond=0)
+        for hour in (0, 2):
+            StoryViewBucket.objects.create(story=self.quiet, period=StoryViewBucket.HOUR,
+                                           start=old + timedelta(hours=hour), story_views=10)
+        rollup_views(now)
+        daily = StoryViewBucket.objects.get(story=self.quiet)
+        self.assertEqual((daily.period, daily.start, daily.story_views),
+                         (StoryViewBucket.DAY, old.replace(hour=0), 20))
+
+    def test_refresh_is_scheduled_once_and_seen_by_every_process(self):
+        now = timezone.now()
+        later = now + timedelta(minutes=10)
+        self.assertTrue(TrendingState.claim_schedule(now, later))
+        self.assertFalse(TrendingState.claim_schedule(now + timedelta(minutes=1), later))
+        self.assertTrue(TrendingState.claim_schedule(later, later + timedelta(minutes=10)))
+
+        # the stamp lives in the database, so a refresh run by the worker changes home's ETag
+        first = self.client.get(reverse('home'))
+        refresh_trending()
+        cache.clear()
+        again = self.client.get(reverse('home'), headers={'if-none-match': first['ETag']})
+        self.assertEqual(again.status_code, 200)
+
+
+class RatingScoreTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username="writer")
+        self.readers = [User.objects.create(username=f"reader{i}") for i in range(20)]
+        self.lone = Story.objects.create(title="Lone Five", author=self.author, description="A story.")
+        self.loved = Story.objects.create(title="Loved", author=self.author, description="A story.")
+        self.unrated = Story.objects.create(title="Unrated", author=self.author, description="A story.")
+        Review.objects.create(story=self.lone, author=self.readers[0], rating=5, comment="Great.")
+        for i, reader in enumerate(self.readers):
+            Review.objects.create(story=self.loved, author=reader, rating=5 if i % 5 else 4, comment="Lovely.")
+
+    def test_many_good_reviews_outrank_one_perfect_review(self):
+        self.lone.refresh_from_db()
+        self.loved.refresh_from_db()
+        self.assertGreater(self.lone.avg_rating, self.loved.avg_rating)
+        self.assertGreater(self.loved.rating_score, self.lone.rating_score)
+
+        home = self.client.get(reverse('home')).context['rating_stories']
+        self.assertEqual(home, [self.loved, self.lone, self.unrated])
+        listing = self.client.get(reverse('story_list'), {'order': 'rating'}).context['stories']
+        self.assertEqual(list(listing), [self.loved, self.lone, self.unrated])
+
+    def test_score_follows_review_changes_and_matches_rebuild(self):
+        review = Review.objects.get(story=self.lone)
+        review.rating = 1
+        review.save()
+        self.lone.refresh_from_db()
+        lowered = self.lone.rating_score
+        self.assertLess(lowered, 3)
+
+        Story.objects.update(rating_score=0)
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.lone.refresh_from_db()
+        self.assertAlmostEqual(self.lone.rating_score, lowered)
+
+        review.delete()
+        self.lone.refresh_from_db()
+        self.assertEqual((self.lone.rating_score, self.lone.avg_rating), (0, None))
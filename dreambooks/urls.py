@@ -1,15 +1,17 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('stories/', views.story_list, name='story_list'),
     path('stories/new/', views.story_create, name='story_create'),
+    path('stories/more/', views.story_list_more, name='story_list_more'),
     path('stories/<slug:slug>/', views.story_detail, name='story_detail'),
     path('users/<str:username>/', views.profile, name='profile'),
     path('stories/<slug:slug>/chapters/new/', views.chapter_create, name='chapter_create'),
     path('stories/<slug:slug>/chapters/<int:pk>/', views.chapter_detail, name='chapter_detail'),
+    path('stories/<slug:slug>/chapters/<int:pk>/progress/', views.chapter_progress, name='chapter_progress'),
     path('reviews/add/<slug:story_slug>/', views.review_create, name='review_create'),
     path('reviews/edit/<int:review_id>/', views.review_edit, name='review_edit'),
     path('reviews/delete/<int:review_id>/', views.review_delete, name='review_delete'),
@@ -19,9 +21,20 @@ urlpatterns = [
     path('stories/<slug:slug>/chapters/<int:pk>/edit/', views.chapter_edit, name='chapter_edit'),
     path('stories/<slug:slug>/chapters/<int:pk>/delete/', views.chapter_delete, name='chapter_delete'),
     path('stories/<slug:slug>/edit/', views.story_edit, name='story_edit'),
+    path('stories/<slug:slug>/download/<str:fmt>/', views.story_export, name='story_export'),
     # path('contact/', views.contact, name='contact'),
     path("contact/", views.contact_list_create, name="contact"),
     path("contact/<int:pk>/edit/", views.contact_edit, name="contact_edit"),
     path("contact/<int:pk>/delete/", views.contact_delete, name="contact_delete"),
     path('about/', views.about, name='about'),
+    path('stats/card-cache/', views.card_stats, name='card_stats'),
+
+    # read-only JSON API, see dreambooks.api
+    path('api/v1/stories/', api.story_list, name='api_story_list'),
+    path('api/v1/stories/<slug:slug>/', api.story_detail, name='api_story_detail'),
+    path('api/v1/stories/<slug:slug>/chapters/', api.chapter_list, name='api_chapter_list'),
+    path('api/v1/stories/<slug:slug>/chapters/<int:pk>/body/', api.chapter_body, name='api_chapter_body'),
+    path('api/v1/stories/<slug:slug>/reviews/', api.review_list, name='api_review_list'),
+    path('api/v1/genres/', api.genre_list, name='api_genre_list'),
+    path('api/v1/users/<str:username>/', api.profile, name='api_profile'),
 ]
\ No newline at end of file
@@ -1,52 +1,82 @@
+import asyncio
 from urllib import request
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from .models import Story, Chapter, Review, Genre, ContactMessage
 from django.core.paginator import Paginator
+from .analytics import CHAPTER_VIEW, STORY_VIEW, counts_views
+from .cards import bump_card_versions, card_cache_stats, render_cards, reset_card_cache_stats
+from .conditional import (
+    CHAPTER_MAX_AGE, LISTING_MAX_AGE, STORY_MAX_AGE, catalogue_validator, conditional_page, home_validator,
+    progress_validator, story_validator,
+)
+from .exports import FORMATS as EXPORT_FORMATS, astream_export, export_path, stream_export
+from .navigation import aadjacent_chapters
+from .pagecache import cached_page
+from .pagination import CursorPaginator
+from .progress import progress_buffer, record_progress, records_progress
+from .search import get_backend as get_search_backend
 from .forms import SignUpForm, StoryForm, ReviewForm
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse
-from django.http import HttpResponseForbidden
-from django.db.models import Avg
-
-def home(request):
-    # Newest Update
-    # newest_qs = Story.objects.all().order_by('-updated_at')
-    newest_qs = Story.objects.all().order_by('-updated_at') \
-        .prefetch_related('genres') \
-        .annotate(avg_rating=Avg('reviews__rating'))
-    newest_paginator = Paginator(newest_qs, 4)
-    newest_page_num = request.GET.get('newest_page') or 1
-    newest_page_obj = newest_paginator.get_page(newest_page_num)
-
-    # Latest stories by date
-    latest_qs = Story.objects.all().order_by('-created_at') \
-        .prefetch_related('genres') \
-        .annotate(avg_rating=Avg('reviews__rating'))
-    latest_paginator = Paginator(latest_qs, 4)
-    latest_page_num = request.GET.get('latest_page') or 1
-    latest_page_obj = latest_paginator.get_page(latest_page_num)
-
-    # Top-rated stories by average rating
-    rating_qs = Story.objects.all().prefetch_related('genres') \
-        .annotate(avg_rating=Avg('reviews__rating')) \
-        .order_by('-avg_rating', '-created_at')  # break ties by newest first
-    rating_paginator = Paginator(rating_qs, 4)
-    rating_page_num = request.GET.get('rating_page') or 1
-    rating_page_obj = rating_paginator.get_page(rating_page_num)
-
-    return render(request, 'dreambooks/home.html', {
-        'latest_stories': latest_page_obj.object_list,
-        'latest_page_obj': latest_page_obj,
-        'latest_paginator': latest_paginator,
-        'rating_stories': rating_page_obj.object_list,
-        'rating_page_obj': rating_page_obj,
-        'rating_paginator': rating_paginator,
-        'newest_stories': newest_page_obj.object_list,
-        'newest_page_obj': newest_page_obj,
-        'newest_paginator': newest_paginator,
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse,
+    StreamingHttpResponse,
+)
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import condition, require_POST, require_safe
+from django.db.models import Case, IntegerField, Value, When
+from django.utils import timezone
+
+STORY_LIST_PAGE_SIZE = 20
+STORY_LIST_MAX_PAGE_SIZE = 50
+SEARCH_RESULT_LIMIT = 500
+
+
+# The read-heavy views below are async: under ASGI they load their rows through
+# the async ORM and only hand the finished context to a worker thread for
+# rendering (context processors and template tags may still touch the session
+# or cache synchronously).
+async def _arender(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+@conditional_page(home_validator, LISTING_MAX_AGE, user_validator=progress_validator)
+@cached_page('newest_page', 'latest_page', 'rating_page', 'trending_page')
+async def home(request):
+    newest_page, latest_page, rating_page, trending_page = await asyncio.gather(
+        # Newest Update
+        CursorPaginator(Story.objects.for_cards(), ('-updated_at', '-id'), 4)
+        .aget_page(request, 'newest_page'),
+        # Latest stories by date
+        CursorPaginator(Story.objects.for_cards(), ('-created_at', '-id'), 4)
+        .aget_page(request, 'latest_page'),
+        # Top-rated stories by Bayesian rating score, ties broken by newest first
+        CursorPaginator(Story.objects.for_cards(), ('-rating_score', '-created_at', '-id'), 4)
+        .aget_page(request, 'rating_page'),
+        # Trending: decayed recent views, precomputed by dreambooks.analytics
+        CursorPaginator(Story.objects.for_cards().filter(trending_score__gt=0), ('-trending_score', '-id'), 4)
+        .aget_page(request, 'trending_page'),
+    )
+
+    return await _arender(request, 'dreambooks/home.html', {
+        'latest_stories': latest_page.object_list,
+        'latest_page': latest_page,
+        'rating_stories': rating_page.object_list,
+        'rating_page': rating_page,
+        'newest_stories': newest_page.object_list,
+        'newest_page': newest_page,
+        'trending_stories': trending_page.object_list,
+        'trending_page': trending_page,
     })
 
 
@@ -85,7 +115,9 @@ def chapter_create(request, slug):
                 chapter.order = current_max + 1
 
             chapter.save()
-            story.save()
+            # only updated_at changes; skip Story.save() and its signal side effects
+            Story.objects.filter(pk=story.pk).update(updated_at=timezone.now())
+            bump_card_versions([story.pk])
             # redirect to chapter detail if that view exists, else story detail
             try:
                 return redirect('chapter_detail', story.slug, chapter.pk)
@@ -108,80 +140,44 @@ def signup(request):
         form = SignUpForm()
     return render(request, 'dreambooks/signup.html', {'form': form})
 
-def story_detail(request, slug):
-    story = get_object_or_404(Story, slug=slug)
+@counts_views(STORY_VIEW, 'slug')
+@conditional_page(story_validator, STORY_MAX_AGE)
+@cached_page('page')
+async def story_detail(request, slug):
+    story = await aget_object_or_404(Story.objects.select_related('author').prefetch_related('genres'), slug=slug)
 
-    story.avg_rating = story.reviews.aggregate(avg=Avg('rating'))['avg'] or 0
-    story.real_avg_rating = story.avg_rating
-    story.avg_rating = round(story.avg_rating)
+    # avg_rating is stored on the story; keep the rounded value for the stars
+    story.real_avg_rating = story.avg_rating or 0
+    story.avg_rating = round(story.real_avg_rating)
 
-    # determine related manager for chapters
-    chapters_qs = None
-    if hasattr(story, 'chapter_set'):
-        chapters_qs = story.chapter_set.all()
-    elif hasattr(story, 'chapters'):
-        chapters_qs = story.chapters.all()
-    else:
-        try:
-            chapters_qs = Chapter.objects.filter(**{
-                next(f.name for f in Chapter._meta.get_fields() if getattr(f, 'related_model', None) is Story): story
-            })
-        except Exception:
-            chapters_qs = Chapter.objects.none()
-
-    # order chapters
-    field_names = [f.name for f in Chapter._meta.get_fields()]
-    if 'order' in field_names:
-        chapters_qs = chapters_qs.order_by('order')
-    elif 'created_at' in field_names:
-        chapters_qs = chapters_qs.order_by('created_at')
-
-    # paginate 10 chapters per page
+    # paginate 10 chapters per page; count first so get_page() doesn't query synchronously
+    chapters_qs = story.chapters.order_by('order')
     paginator = Paginator(chapters_qs, 10)
-    page_number = request.GET.get('page') or 1
-    page_obj = paginator.get_page(page_number)
+    paginator.count = await chapters_qs.acount()
+    page_obj = paginator.get_page(request.GET.get('page') or 1)
+    page_obj.object_list = await _alist(page_obj.object_list)
 
-    # handle review submission
-    review_form = None
-    if request.user.is_authenticated:
-        # check if the user already posted a review for this story
-        existing_review = story.reviews.filter(author=request.user).first()
-
-        if request.method == 'POST':
-            if existing_review:
-                # they already reviewed → do NOT allow another
-                messages.error(request, "You have already posted a review for this story.")
-                return redirect('story_detail', slug=slug)
-
-            review_form = ReviewForm(request.POST)
-            if review_form.is_valid():
-                review = review_form.save(commit=False)
-                review.story = story
-                review.author = request.user
-                review.save()
-                messages.success(request, "Your review has been posted!")
-                return redirect('story_detail', slug=slug)
-        else:
-            review_form = ReviewForm() if not existing_review else None
-
-
-    # handle review submission
+    # handle review submission; the form itself is a per-user hole in the template
     review_form = None
-    if request.user.is_authenticated:
-        if request.method == 'POST':
-            review_form = ReviewForm(request.POST)
-            if review_form.is_valid():
-                review = review_form.save(commit=False)
-                review.story = story
-                review.author = request.user
-                review.save()
-                return redirect('story_detail', slug=slug)
-        else:
-            review_form = ReviewForm()
-
-    reviews = story.reviews.all()
-
-    return render(request, 'dreambooks/story_detail.html', {
+    user = await request.auser()
+    if request.method == 'POST' and user.is_authenticated:
+        if await story.reviews.filter(author=user).aexists():
+            # they already reviewed → do NOT allow another
+            messages.error(request, "You have already posted a review for this story.")
+            return redirect('story_detail', slug=slug)
+
+        review_form = ReviewForm(request.POST)
+        if review_form.is_valid():
+            review = review_form.save(commit=False)
+            review.story = story
+            review.author = user
+            await review.asave()
+            messages.success(request, "Your review has been posted!")
+            return redirect('story_detail', slug=slug)
+
+    reviews = await _alist(story.reviews.select_related('author'))
+
+    return await _arender(request, 'dreambooks/story_detail.html', {
         'story': story,
         'chapters': page_obj.object_list,  # only current page chapters
         'page_obj': page_obj,
@@ -190,12 +186,14 @@ def story_detail(request, slug):
         'review_form': review_form,
     })
 
-def profile(request, username):
+async def profile(request, username):
     User = get_user_model()
-    profile_user = get_object_or_404(User, username=username)
-    stories = Story.objects.filter(author=profile_user).order_by('-created_at')
-    reviews = Review.objects.filter(author=profile_user).select_related("story").order_by("-created_at")
-    return render(request, 'dreambooks/profile.html', {
+    profile_user = await aget_object_or_404(User, username=username)
+    stories, reviews = await asyncio.gather(
+        _alist(Story.objects.filter(author=profile_user).order_by('-created_at')),
+        _alist(Review.objects.filter(author=profile_user).select_related("story", "author").order_by("-created_at")),
+    )
+    return await _arender(request, 'dreambooks/profile.html', {
         'profile_user': profile_user,
         'stories': stories,
         "reviews": reviews,
@@ -239,58 +237,16 @@ def story_create(request):
     return render(request, 'dreambooks/story_create.html', {'form': form})
 
 
-def chapter_detail(request, slug, pk):
-    # ensure story exists
-    story = get_object_or_404(Story, slug=slug)
-
-    # find FK name on Chapter that points to Story (if any)
-    fk_name = None
-    for f in Chapter._meta.get_fields():
-        if getattr(f, 'related_model', None) is Story:
-            fk_name = f.name
-            break
-
-    # load chapter ensuring it belongs to the story
-    if fk_name:
-        chapter = get_object_or_404(Chapter, pk=pk, **{fk_name: story})
-    else:
-        chapter = get_object_or_404(Chapter, pk=pk)
-        # extra safety: if chapter has no relation, ensure it actually belongs (best-effort)
-        try:
-            if getattr(chapter, 'story', None) != story:
-                return get_object_or_404(Chapter, pk=0)  # force 404
-        except Exception:
-            pass
-
-    # build ordered queryset for prev/next navigation
-    chapters_qs = None
-    if hasattr(story, 'chapter_set'):
-        chapters_qs = story.chapter_set.all()
-    elif hasattr(story, 'chapters'):
-        chapters_qs = story.chapters.all()
-    else:
-        if fk_name:
-            chapters_qs = Chapter.objects.filter(**{fk_name: story})
-        else:
-            chapters_qs = Chapter.objects.none()
-
-    # choose ordering field
-    field_names = [f.name for f in Chapter._meta.get_fields()]
-    order_field = 'order' if 'order' in field_names else None
-    date_field = 'created_at' if 'created_at' in field_names else None
-
-    if order_field:
-        chapters_qs = chapters_qs.order_by(order_field)
-        prev_ch = chapters_qs.filter(**{f"{order_field}__lt": getattr(chapter, order_field)}).order_by(f"-{order_field}").first()
-        next_ch = chapters_qs.filter(**{f"{order_field}__gt": getattr(chapter, order_field)}).order_by(order_field).first()
-    elif date_field:
-        chapters_qs = chapters_qs.order_by(date_field)
-        prev_ch = chapters_qs.filter(**{f"{date_field}__lt": getattr(chapter, date_field)}).order_by(f"-{date_field}").first()
-        next_ch = chapters_qs.filter(**{f"{date_field}__gt": getattr(chapter, date_field)}).order_by(date_field).first()
-    else:
-        chapters_qs = chapters_qs.order_by('pk')
-        prev_ch = chapters_qs.filter(pk__lt=chapter.pk).order_by('-pk').first()
-        next_ch = chapters_qs.filter(pk__gt=chapter.pk).order_by('pk').first()
+@counts_views(CHAPTER_VIEW, 'pk')
+@records_progress
+@conditional_page(story_validator, CHAPTER_MAX_AGE)
+@cached_page('page')
+async def chapter_detail(request, slug, pk):
+    # one query for the chapter, its text, story and author; navigation comes from the cached index
+    chapter = await aget_object_or_404(Chapter.objects.select_related('story__author', 'body'),
+                                       pk=pk, story__slug=slug)
+    story = chapter.story
+    prev_ch, next_ch = await aadjacent_chapters(story, chapter.pk)
 
     # preserve page param for back links if present
     page = request.GET.get('page')
@@ -298,7 +254,7 @@ def chapter_detail(request, slug, pk):
     if page:
         back_url = f"{back_url}?page={page}"
 
-    return render(request, 'dreambooks/chapter_detail.html', {
+    return await _arender(request, 'dreambooks/chapter_detail.html', {
         'story': story,
         'chapter': chapter,
         'prev_chapter': prev_ch,
@@ -306,6 +262,23 @@ def chapter_detail(request, slug, pk):
         'back_url': back_url,
     })
 
+@require_POST
+@login_required
+async def chapter_progress(request, slug, pk):
+    """Beacon from chapter_detail: how far into the chapter the reader has scrolled."""
+    try:
+        position = int(request.POST['position'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest()
+    # progress is only buffered here, so check the chapter is the story's before it is kept
+    if not await Chapter.objects.filter(pk=pk, story__slug=slug).aexists():
+        raise Http404
+    user = await request.auser()
+    record_progress(user.pk, pk, position)
+    if progress_buffer.due():
+        await sync_to_async(progress_buffer.flush)()
+    return HttpResponse(status=204)
+
 @login_required
 def review_create(request, story_slug):
     story = get_object_or_404(Story, slug=story_slug)
@@ -391,36 +364,137 @@ def chapter_delete(request, slug, pk):
         'chapter': chapter
     })
 
-def story_list(request):
+def _search_hits(request):
+    q = request.GET.get('q')
+    return get_search_backend().search(q, limit=SEARCH_RESULT_LIMIT) if q else []
+
+
+def _story_list_paginator(request, hits):
+    """Filter and order the catalogue for story_list and its fragment endpoint."""
     q = request.GET.get('q')
     genre_filter = request.GET.get('genre')
-    order = request.GET.get('order')  # 'newest', 'oldest', 'rating'
+    order = request.GET.get('order')  # 'relevance', 'newest', 'oldest', 'rating'
 
-    qs = Story.objects.all().prefetch_related('genres').annotate(avg_rating=Avg('reviews__rating'))
+    qs = Story.objects.for_cards()
 
     if q:
-        qs = qs.filter(title__icontains=q)
+        qs = qs.filter(id__in=[hit.story_id for hit in hits]).annotate(search_rank=Case(
+            *[When(id=hit.story_id, then=Value(position)) for position, hit in enumerate(hits)],
+            default=Value(len(hits)),
+            output_field=IntegerField(),
+        ))
+        if not order:
+            order = 'relevance'
 
     if genre_filter:
         qs = qs.filter(genres__name=genre_filter)
 
-    if order == 'newest':
-        qs = qs.order_by('-created_at')
+    if order == 'relevance' and q:
+        ordering = ('search_rank', 'id')
     elif order == 'oldest':
-        qs = qs.order_by('created_at')
+        ordering = ('created_at', 'id')
     elif order == 'rating':
-        qs = qs.order_by('-avg_rating')
+        # rating_score is never NULL; unreviewed stories score 0 and come last
+        ordering = ('-rating_score', '-created_at', '-id')
     else:
-        qs = qs.order_by('-created_at')  # default
+        ordering = ('-created_at', '-id')  # 'newest' and default
+
+    # per_page is client-controlled, so clamp it to a hard cap
+    try:
+        per_page = int(request.GET.get('per_page') or STORY_LIST_PAGE_SIZE)
+    except ValueError:
+        per_page = STORY_LIST_PAGE_SIZE
+    per_page = max(1, min(per_page, STORY_LIST_MAX_PAGE_SIZE))
 
-    return render(request, 'dreambooks/story_list.html', {
-        'stories': qs,
+    return CursorPaginator(qs, ordering, per_page), {
         'query': q,
         'selected_genre': genre_filter,
         'selected_order': order,
-        'all_genres': Genre.objects.all(),  # send all genres for the filter dropdown
+    }
+
+
+def _attach_snippets(page, hits):
+    snippets = {hit.story_id: hit.snippet for hit in hits}
+    for story in page.object_list:
+        story.search_snippet = snippets.get(story.id, '')
+
+
+def _story_list_page(request):
+    hits = _search_hits(request)
+    paginator, filters = _story_list_paginator(request, hits)
+    page = paginator.get_page(request, 'page', exclude=('format',))
+    _attach_snippets(page, hits)
+    return page, filters
+
+
+@conditional_page(catalogue_validator, LISTING_MAX_AGE)
+async def story_list(request):
+    hits = await sync_to_async(_search_hits)(request)
+    paginator, filters = _story_list_paginator(request, hits)
+    page, all_genres = await asyncio.gather(
+        paginator.aget_page(request, 'page', exclude=('format',)),
+        _alist(Genre.objects.all()),  # send all genres for the filter dropdown
+    )
+    _attach_snippets(page, hits)
+
+    return await _arender(request, 'dreambooks/story_list.html', {
+        'stories': page.object_list,
+        'page': page,
+        'all_genres': all_genres,
+        **filters,
     })
 
+
+def story_list_more(request):
+    """Next page of story_list as a bare fragment, for infinite scroll."""
+    page, _ = _story_list_page(request)
+    next_url = f"{reverse('story_list_more')}{page.next_query}" if page.has_next else None
+
+    cards = render_cards(page.object_list, 'dreambooks/story_list_item.html', request=request)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'html': ''.join(cards), 'has_next': page.has_next, 'next_url': next_url})
+
+    # the cards are rendered already; a plain response keeps Content-Length, ETag and gzip
+    response = HttpResponse(''.join(cards))
+    if next_url:
+        response['X-Next-Page'] = next_url
+    return response
+
+@staff_member_required
+def card_stats(request):
+    """This process's card cache counters as JSON; POST resets them."""
+    if request.method == 'POST':
+        reset_card_cache_stats()
+    hits, misses = card_cache_stats()
+    total = hits + misses
+    return JsonResponse({'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0})
+
+
+def _story_modified(request, slug, fmt):
+    return Story.objects.filter(slug=slug).values_list('modified_at', flat=True).first()
+
+
+@require_safe
+@condition(last_modified_func=_story_modified)
+def story_export(request, slug, fmt):
+    """The whole story as one TXT or EPUB download, built once per version of the story."""
+    if fmt not in EXPORT_FORMATS:
+        raise Http404
+    story = get_object_or_404(Story.objects.select_related('author'), slug=slug)
+    filename = f'{story.slug}.{fmt}'
+    try:
+        return FileResponse(export_path(story, fmt).open('rb'), as_attachment=True, filename=filename,
+                            content_type=EXPORT_FORMATS[fmt])
+    except FileNotFoundError:
+        pass
+    # first download of this version: stream it while it is written to disk,
+    # with an async iterator under ASGI so the book is never held in memory
+    chunks = astream_export(story, fmt) if isinstance(request, ASGIRequest) else stream_export(story, fmt)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
 @login_required
 def story_edit(request, slug):
     story = get_object_or_404(Story, slug=slug)
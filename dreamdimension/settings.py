@@ -80,6 +80,49 @@ DATABASES = {
     }
 }
 
+# PRAGMA name -> value run on each new SQLite connection (dreambooks.sqlite);
+# see settings_production for the tuned set.
+DREAMBOOKS_SQLITE_PRAGMAS = {}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Story cards are cached in the 'cards' cache. Swap its backend for a shared one in production, e.g.
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'cache'
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dreamdimension',
+    },
+    'cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dreamdimension-cards',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+DREAMBOOKS_CARD_CACHE = 'cards'
+DREAMBOOKS_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Rendered home/story/chapter pages (dreambooks.pagecache). Entries are keyed
+# on the stories' modified_at stamp, so the timeout only bounds memory use.
+DREAMBOOKS_PAGE_CACHE = 'default'
+DREAMBOOKS_PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Slow side effects (cover variants, search indexing, email) are queued as
+# dreambooks.models.Job rows and run by `python manage.py run_jobs`.
+# In eager mode they run inline after the request's transaction commits instead,
+# so the dev server works without a worker. Outside eager mode the worker
+# invalidates cached cards and pages, so the default and card caches must be
+# shared between processes (startup fails with LocMemCache), and it deletes
+# finished jobs after dreambooks.jobs.DONE_RETENTION.
+DREAMBOOKS_JOBS_EAGER = DEBUG
+
+# Built TXT/EPUB downloads of whole stories (dreambooks.exports).
+DREAMBOOKS_EXPORT_ROOT = BASE_DIR / 'exports'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
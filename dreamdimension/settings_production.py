@@ -0,0 +1,76 @@
+"""
+Production profile: ``DJANGO_SETTINGS_MODULE=dreamdimension.settings_production``.
+
+Everything not overridden here comes from settings.py.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+
+# a worker process (`manage.py run_jobs`) runs the queue in production
+DREAMBOOKS_JOBS_EAGER = False
+
+
+# Cache
+# Card fragments, rendered pages, the chapter index and their invalidations must
+# reach every web process and the job worker, so no LocMemCache here (startup
+# refuses it, see dreambooks.jobs.check_shared_caches). Redis when
+# DJANGO_REDIS_URL is set, else files shared by the processes of one host.
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+            'KEY_PREFIX': alias,
+        }
+        for alias in ('default', 'cards')
+    }
+else:
+    CACHE_DIR = os.environ.get('DJANGO_CACHE_DIR', BASE_DIR / 'cache')
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, alias),
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        }
+        for alias, max_entries in (('default', 20000), ('cards', 20000))
+    }
+
+
+# Database
+# The read views are async and served through asgi.py, where Django advises
+# against persistent connections, so each request opens its own (and re-runs
+# the pragmas below). Set DJANGO_CONN_MAX_AGE, e.g. to 600, for a WSGI deployment.
+DATABASES['default'].update({
+    'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 0)),
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # take the write lock at BEGIN, so a transaction that reads before it writes
+        # waits for busy_timeout instead of failing with "database is locked"
+        'transaction_mode': 'IMMEDIATE',
+    },
+})
+
+DREAMBOOKS_SQLITE_PRAGMAS = {
+    # readers no longer block the writer, nor the writer readers
+    'journal_mode': 'wal',
+    # in WAL mode NORMAL is still corruption-safe; a power loss can only drop
+    # the last commits, and commits stop waiting for an fsync
+    'synchronous': 'normal',
+    # wait up to 5 s for the write lock instead of erroring at once
+    'busy_timeout': 5000,
+    # page cache per connection, in KiB when negative (64 MiB)
+    'cache_size': -64000,
+    # read the database through a 256 MiB memory map instead of read() calls
+    'mmap_size': 256 * 1024 * 1024,
+    # temporary tables and sort b-trees in memory
+    'temp_store': 'memory',
+}
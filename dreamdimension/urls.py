@@ -19,6 +19,7 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from dreambooks import views as dreambooks_views
+from dreambooks.forms import QueuedPasswordResetForm
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
@@ -34,7 +35,8 @@ urlpatterns = [
     
     # password reset flows
     path('password-reset/', auth_views.PasswordResetView.as_view(
-        template_name='dreambooks/password_reset_form.html'
+        template_name='dreambooks/password_reset_form.html',
+        form_class=QueuedPasswordResetForm,
     ), name='password_reset'),
     path('password-reset/done/', auth_views.PasswordResetDoneView.as_view(
         template_name='dreambooks/password_reset_done.html'